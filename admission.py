@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Settings of one admission class, as written in its ADMISSION_<CLASS> variable:
+# "concurrency=4,queue=2,wait_ms=200,rate=50,burst=100". rate=0 turns the per-client
+# limit off.
+LIMIT_KEYS = ('concurrency', 'queue', 'wait_ms', 'rate', 'burst')
+
+def parse_limits(spec, defaults):
+    """Return defaults updated from a "key=value,..." spec; raises ValueError on a bad one."""
+    limits = dict(defaults)
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition('=')
+        key = key.strip()
+        if not sep or key not in LIMIT_KEYS:
+            raise ValueError(f"Invalid admission setting '{item.strip()}'; expected one of {', '.join(LIMIT_KEYS)}")
+        limits[key] = float(value)
+    return limits
+
+class Rejected(Exception):
+    """A request that was not admitted: 429 if its client is over its rate, 503 if the class is full."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after)) # Retry-After is whole seconds
+
+class TokenBuckets:
+    """Per-client token buckets: rate tokens a second, at most burst saved up.
+
+    Only the most recently seen max_clients are remembered; a client that was dropped
+    starts again with a full bucket, which is what it would have refilled to anyway
+    unless it had been active within the last burst / rate seconds.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._max_clients = max_clients
+        self._buckets = OrderedDict() # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, client, now=None):
+        """Take one token; returns 0 if there was one, else the seconds until there will be."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._buckets.pop(client, None)
+            tokens = self.burst if entry is None else min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self._max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+class AdmissionClass:
+    """Limits one class of requests (reads, checkout, ...) within this process.
+
+    At most `concurrency` requests run at once; up to `queue` more wait for a slot, each
+    for at most wait_ms, and anything beyond that is turned away at once. A waiting
+    request holds a server thread, so concurrency + queue of the busy classes should
+    stay below the thread count to leave room for the others.
+    """
+
+    def __init__(self, name, concurrency, queue=0, wait_ms=0, rate=0, burst=0):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.queue = max(0, int(queue))
+        self.max_wait = wait_ms / 1000
+        self.buckets = TokenBuckets(rate, burst or rate) if rate > 0 else None
+        self.active = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self._cond = threading.Condition()
+
+    def admit(self, client=None):
+        """Take a slot (call release() when done) and return the seconds spent waiting for it.
+
+        Raises Rejected if the client is over its rate or no slot frees up in time.
+        """
+        if self.buckets is not None and client is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                raise Rejected(429, 'rate_limited', wait)
+        with self._cond:
+            if self.active < self.concurrency:
+                self.active += 1
+                self.admitted_total += 1
+                return 0.0
+            if self.queued >= self.queue:
+                raise Rejected(503, 'queue_full', self.max_wait)
+            self.queued += 1
+            started = time.monotonic()
+            deadline = started + self.max_wait
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Rejected(503, 'queue_timeout', self.max_wait)
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.active += 1
+            self.admitted_total += 1
+            return time.monotonic() - started
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'wait_ms': round(self.max_wait * 1000),
+                'rate': self.buckets.rate if self.buckets else 0,
+                'burst': self.buckets.burst if self.buckets else 0,
+                'active': self.active,
+                'queued': self.queued,
+                'admitted_total': self.admitted_total,
+            }
@@ -1,39 +1,386 @@
-from flask import Flask, jsonify, request, render_template, session # Ensure session is imported
+import time # For the startup report
+STARTUP_BEGAN = time.perf_counter() # Measured from here, before Flask itself is imported
+
+from flask import Flask, jsonify, request, render_template, session, Response, stream_with_context, g, has_app_context, url_for, got_request_exception, send_file, send_from_directory, make_response # Ensure session is imported
 import sqlite3 # Add this import
-import pandas as pd # Add this import
 import os # For secret_key
+import sys # For the startup report
+import threading # For one-time app initialisation
+import json # For streaming product rows
+import tempfile # For queued upload files
+import re # For building full-text search queries
+import secrets # For cart ids
+import mimetypes # For precompressed static files
+from werkzeug.utils import safe_join
+from markupsafe import Markup # For inline page bootstrap JSON
 from datetime import timedelta # For session lifetime
+from db_pool import ConnectionPool, DatabaseBusy, run_immediate_transaction
+from import_jobs import ImportJobManager
+from catalog_cache import CatalogCache
+from catalog_version import CatalogVersion
+from cart_store import MemoryCartStore, SQLiteCartStore
+from write_queue import WriteQueue
+from admission import AdmissionClass, Rejected, parse_limits
+from product_bulk import BulkItemErrors, bulk_create, bulk_delete, bulk_patch
+from sales_rollups import TOP_SELLER_METRICS, daily_sales, product_sales, record_order, top_sellers
+from db_pool import InstrumentedConnection
+from profiling import ProfileStore
+from prefix_index import PrefixIndex
+from data_export import EXPORT_FORMATS, export_chunks
+from compression import COMPRESS_MIN_BYTES, choose_encoding, compress
+from build_assets import DIST_DIR_NAME, load_manifest
+from metrics import Collector, Counter, Histogram, render as render_metrics, statement_label
+
+def shared_secret_key(path):
+    # Every worker process must sign sessions with the same key, or a cart started in
+    # one worker is lost in the next. Generate a key once and share it through a file;
+    # os.link() fails if another worker got there first, and then its key is used.
+    if not os.path.exists(path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.secret-key-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_bytes(32))
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
 
 app = Flask(__name__)
 # For production, FLASK_SECRET_KEY should be a strong, persistent random string.
-# If FLASK_SECRET_KEY is not set, os.urandom(24) is used as a fallback (suitable for dev).
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(24))
+# If FLASK_SECRET_KEY is not set, a random key is generated and kept in
+# FLASK_SECRET_KEY_FILE (suitable for dev, and shared by all local worker processes).
+app.secret_key = os.environ.get('FLASK_SECRET_KEY') or shared_secret_key(
+    os.environ.get('FLASK_SECRET_KEY_FILE', '.flask_secret_key'))
 app.permanent_session_lifetime = timedelta(days=7) # Optional: Configure session lifetime
 
 DATABASE_NAME = 'store.db' # Add this line
 
-# Function to get a database connection (will be used by API endpoints later)
+# Built-in instrumentation, scraped as Prometheus text from /metrics.
+request_latency = Histogram('store_http_request_duration_seconds',
+                            'Time to produce a response (streamed bodies excluded), by route.',
+                            ('method', 'route'))
+request_count = Counter('store_http_requests_total', 'Responses sent, by route and status.',
+                        ('method', 'route', 'status'))
+query_latency = Histogram('store_db_query_duration_seconds',
+                          'SQLite statement execution time (first row for SELECTs), by statement.',
+                          ('statement',))
+request_errors = Counter('store_http_unhandled_exceptions_total',
+                         'Exceptions that escaped a view (answered with a 500), by route and type.',
+                         ('route', 'exception'))
+pool_wait = Histogram('store_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.')
+import_phase = Histogram('store_import_phase_seconds', 'Product import time per chunk, by phase.',
+                         ('phase',))
+
+def observe_query(sql, seconds):
+    query_latency.observe(seconds, (statement_label(sql),))
+
+def observe_import_phase(phase, seconds):
+    import_phase.observe(seconds, (phase,))
+
+def record_unhandled_exception(sender, exception, **extra):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    request_errors.inc((route, type(exception).__name__))
+
+got_request_exception.connect(record_unhandled_exception, app)
+
+@app.before_request
+def start_request_timer():
+    g._request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('_request_started')
+    if started is not None:
+        # The URL rule, not the path, so /api/products/<int:product_id> is one series.
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_latency.observe(time.perf_counter() - started, (request.method, route))
+        request_count.inc((request.method, route, str(response.status_code)))
+    return response
+
+# Shared pool of pre-tuned connections (WAL, synchronous=NORMAL, mmap, cache, busy_timeout).
+# Size it at or above the gunicorn thread count so requests rarely wait for a connection.
+db_pool = ConnectionPool(
+    DATABASE_NAME,
+    max_size=int(os.environ.get('DB_POOL_SIZE', 8)),
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    on_query=observe_query,
+    on_wait=pool_wait.observe,
+)
+
+# Function to get a database connection.
+# Inside a request the same pooled connection is reused for the whole app context and
+# handed back by close_db_connection() on teardown; calling conn.close() early is fine.
+# Outside an app context the caller owns the connection and must close() it.
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row # This allows accessing columns by name
+    if not has_app_context():
+        return db_pool.acquire()
+    conn = g.get('_db_conn')
+    if conn is None or conn.released:
+        conn = db_pool.acquire()
+        g._db_conn = conn
     return conn
 
+@app.teardown_appcontext
+def close_db_connection(exception):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.close()
+
+# Optional single-writer group commit (WRITE_QUEUE=1): orders and product writes are
+# funnelled through one writer thread that commits up to WRITE_QUEUE_MAX_BATCH
+# operations per transaction, waiting at most WRITE_QUEUE_MAX_WAIT_MS for a group to fill.
+# A write the writer has not started within WRITE_QUEUE_TIMEOUT_MS is dropped and answered
+# with 503, like a pool timeout.
+write_queue = None
+if os.environ.get('WRITE_QUEUE', 'false').lower() in ('1', 'true', 'yes'):
+    write_queue = WriteQueue(
+        lambda: InstrumentedConnection(db_pool.connect(), observe_query),
+        max_batch=int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 64)),
+        max_wait=float(os.environ.get('WRITE_QUEUE_MAX_WAIT_MS', 2)) / 1000,
+        timeout=float(os.environ.get('WRITE_QUEUE_TIMEOUT_MS', 5000)) / 1000,
+    )
+
+# Runs work(conn) as one write transaction and returns its result. Exceptions raised by
+# work roll back only its own changes and are re-raised here. large=True keeps a long
+# write (a bulk request) off the writer thread, so orders are not queued behind it;
+# it takes the write lock on this request's own connection instead.
+def run_write(work, large=False):
+    if write_queue is not None and not large:
+        return write_queue.run(work)
+    conn = get_db_connection()
+    try:
+        return run_immediate_transaction(conn, work)
+    finally:
+        if not has_app_context():
+            conn.close()
+
+# --- Admission control ---
+
+# Every request that touches the database belongs to a class with its own budget, so a
+# flood of searches cannot take the threads and connections checkout needs. Requests
+# over a class's limits get a fast 503 (class busy) or 429 (client over its rate) with
+# Retry-After, instead of piling up behind the SQLite write lock. Limits are per worker
+# process; set ADMISSION_<CLASS> (see admission.LIMIT_KEYS) to tune one, and
+# ADMISSION_CONTROL=off to disable them all (e.g. for capacity benchmarks).
+# The defaults assume 8 threads (GUNICORN_THREADS) and 8 pooled connections per worker.
+# 'catalog' (single-product edits) and 'reports' are ordinary back-office traffic; the
+# tight 'admin' budget is kept for the whole-catalog jobs: imports, bulk writes, exports.
+ADMISSION_DEFAULTS = {
+    'read': {'concurrency': 4, 'queue': 2, 'wait_ms': 200, 'rate': 50, 'burst': 100},
+    'cart': {'concurrency': 3, 'queue': 2, 'wait_ms': 500, 'rate': 20, 'burst': 40},
+    'checkout': {'concurrency': 2, 'queue': 6, 'wait_ms': 2000, 'rate': 5, 'burst': 10},
+    'catalog': {'concurrency': 2, 'queue': 4, 'wait_ms': 1000, 'rate': 20, 'burst': 40},
+    'reports': {'concurrency': 2, 'queue': 2, 'wait_ms': 500, 'rate': 10, 'burst': 20},
+    'admin': {'concurrency': 1, 'queue': 1, 'wait_ms': 1000, 'rate': 2, 'burst': 10},
+}
+ADMISSION_ENDPOINT_CLASSES = {
+    'home': 'read', 'admin_upload_page': 'read', 'test_db': 'read', 'get_products': 'read',
+    'get_product': 'read', 'search_products': 'read', 'autocomplete_products': 'read',
+    'cart_page': 'cart', 'add_to_cart': 'cart', 'view_cart': 'cart', 'view_cart_count': 'cart',
+    'update_cart_item': 'cart', 'remove_from_cart': 'cart', 'batch_update_cart': 'cart', 'clear_cart': 'cart',
+    'checkout_page': 'checkout', 'place_order': 'checkout',
+    'add_product': 'catalog', 'update_product': 'catalog', 'delete_product': 'catalog',
+    'sales_daily_report': 'reports', 'product_sales_report': 'reports', 'top_sellers_report': 'reports',
+    'bulk_create_products': 'admin', 'bulk_patch_products': 'admin', 'bulk_delete_products': 'admin',
+    'upload_products_excel': 'admin', 'export_products': 'admin', 'export_orders': 'admin',
+}
+# Number of proxies in front of the app that append to X-Forwarded-For (1 on Cloud Run);
+# with 0 the client is the socket peer address.
+ADMISSION_PROXY_HOPS = int(os.environ.get('ADMISSION_PROXY_HOPS', 0))
+
+admission_classes = {}
+if os.environ.get('ADMISSION_CONTROL', 'on').lower() not in ('0', 'off', 'false', 'no'):
+    admission_classes = {
+        name: AdmissionClass(name, **parse_limits(os.environ.get(f'ADMISSION_{name.upper()}'), defaults))
+        for name, defaults in ADMISSION_DEFAULTS.items()
+    }
+
+admission_wait = Histogram('store_admission_wait_seconds', 'Time admitted requests waited for a slot, by class.',
+                           ('class',))
+admission_rejected = Counter('store_admission_rejected_total', 'Requests turned away, by class and reason.',
+                             ('class', 'reason'))
+
+def admission_client():
+    route = request.access_route
+    if ADMISSION_PROXY_HOPS and len(route) >= ADMISSION_PROXY_HOPS:
+        # The entry added by the outermost trusted proxy; anything before it is client-supplied.
+        return route[-ADMISSION_PROXY_HOPS]
+    return request.remote_addr
+
+@app.before_request
+def admit_request():
+    admission = admission_classes.get(ADMISSION_ENDPOINT_CLASSES.get(request.endpoint))
+    if admission is None:
+        return None
+    try:
+        waited = admission.admit(admission_client())
+    except Rejected as e:
+        admission_rejected.inc((admission.name, e.reason))
+        if e.status == 429:
+            message = 'Too many requests, please slow down.'
+        else:
+            message = 'The store is busy right now, please try again shortly.'
+        response = jsonify({'error': message})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    admission_wait.observe(waited, (admission.name,))
+    g._admission = admission
+
+@app.teardown_request
+def release_admission(exception):
+    # Streamed bodies (exports, NDJSON) finish after this point; exports are also
+    # bounded by their own slots (see export_slots).
+    admission = g.pop('_admission', None)
+    if admission is not None:
+        admission.release()
+
+@app.errorhandler(DatabaseBusy)
+def database_busy(e):
+    # No pooled connection freed up within DB_POOL_TIMEOUT (or the writer thread did not
+    # get to the write in time): shed the request the same way. Views re-raise it past
+    # their catch-all handlers for this.
+    admission_rejected.inc((ADMISSION_ENDPOINT_CLASSES.get(request.endpoint, 'other'), e.reason))
+    response = jsonify({'error': 'The store is busy right now, please try again shortly.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/api/admission/stats')
+def admission_stats():
+    return jsonify({'enabled': bool(admission_classes), 'proxy_hops': ADMISSION_PROXY_HOPS,
+                    'classes': {name: admission.stats() for name, admission in admission_classes.items()}})
+
+# --- Static assets and response compression ---
+
+# Written by build_assets.py: source path -> fingerprinted copy under static/dist/.
+asset_manifest = load_manifest(app.static_folder)
+ASSET_MAX_AGE = 365 * 24 * 3600
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    # url_for('static', filename='style.css') -> /static/dist/style.<hash>.css once built.
+    if endpoint == 'static' and values.get('filename') in asset_manifest:
+        values['filename'] = asset_manifest[values['filename']]
+
+def serve_static(filename):
+    if not filename.startswith(DIST_DIR_NAME + '/'):
+        return app.send_static_file(filename)
+    # Fingerprinted files never change under the same name, so browsers can keep them
+    # for a year without revalidating; pick the smallest precompressed copy accepted.
+    encoding, variant = None, filename
+    for candidate, suffix in PRECOMPRESSED_SUFFIXES.items():
+        path = safe_join(app.static_folder, filename + suffix)
+        if request.accept_encodings[candidate] > 0 and path is not None and os.path.isfile(path):
+            encoding, variant = candidate, filename + suffix
+            break
+    response = send_from_directory(app.static_folder, variant, max_age=ASSET_MAX_AGE,
+                                   mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Replaces Flask's default view for the 'static' endpoint; the URL rule is unchanged.
+app.view_functions['static'] = serve_static
+
+def response_encoding(size):
+    """Content-Encoding to use for a body of `size` bytes in this request, or None."""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    return choose_encoding(request.accept_encodings)
+
+@app.after_request
+def compress_json_response(response):
+    # Catalog responses arrive here already compressed (from their cache entry);
+    # this covers every other JSON body big enough to be worth it.
+    if (response.direct_passthrough or response.is_streamed or not response.is_json
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    encoding = response_encoding(len(body))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Same content, different bytes: only a weak validator still applies.
+        response.set_etag(etag, weak=True)
+    return response
+
+# --- Page bootstrap ---
+# Pages are rendered with the data their scripts would otherwise fetch right after
+# loading, as inline JSON (<script type="application/json">, read with readBootstrap()
+# from static/js/utils.js). If that data can't be loaded the value is null and the
+# page falls back to fetching it.
+
+# Products shown on the home page before the user searches.
+BOOTSTRAP_PRODUCTS_LIMIT = 24
+
+def html_safe_json(body):
+    # Same escaping as Jinja's |tojson, applied to an already-encoded JSON body: these
+    # characters only occur inside JSON strings, where the \u escapes mean the same.
+    text = body.decode('utf-8')
+    for char, escaped in (('<', '\\u003c'), ('>', '\\u003e'), ('&', '\\u0026'), ("'", '\\u0027')):
+        text = text.replace(char, escaped)
+    return Markup(text)
+
+def bootstrap_products():
+    # The same cache entry as GET /api/products?limit=24, so the home page costs no
+    # query while the catalog is unchanged.
+    fields = list(PRODUCT_FIELDS)
+    cache_key = ('products', 0, BOOTSTRAP_PRODUCTS_LIMIT, tuple(fields))
+    entry = catalog_cache.get(cache_key)
+    if entry is None:
+        version = catalog_cache.version
+        try:
+            page = load_products_page(get_db_connection(), fields, 0, BOOTSTRAP_PRODUCTS_LIMIT)
+        except (sqlite3.Error, DatabaseBusy) as e:
+            print(f"Could not load products for the page bootstrap: {e}")
+            return None
+        entry = catalog_cache.put(cache_key, app.json.dumps(page).encode('utf-8'), version)
+    return html_safe_json(entry.body)
+
+def bootstrap_cart(full=False):
+    # The cart count for the nav on every page; the whole cart summary on the pages
+    # that show it.
+    try:
+        if full:
+            return cart_summary(load_cart_items(get_cart_id()))
+        return {'total_items': cart_item_count(get_cart_id())}
+    except (sqlite3.Error, DatabaseBusy) as e:
+        print(f"Could not load the cart for the page bootstrap: {e}")
+        return None
+
+def render_page(template, cart=None, **context):
+    response = make_response(render_template(template, bootstrap_cart=cart or bootstrap_cart(), **context))
+    # The page embeds this visitor's cart, so no shared caches.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/')
 def home():
-    # return "Welcome to the Minecraft Store! (Placeholder)" # Old line
-    return render_template('home.html') # New line
+    return render_page('home.html', bootstrap_products=bootstrap_products())
 
 @app.route('/admin/upload')
 def admin_upload_page():
-    return render_template('admin_upload.html')
+    return render_page('admin_upload.html')
 
 @app.route('/cart')
 def cart_page():
-    return render_template('cart.html')
+    return render_page('cart.html', cart=bootstrap_cart(full=True))
 
 @app.route('/checkout')
 def checkout_page():
-    return render_template('checkout.html')
+    return render_page('checkout.html', cart=bootstrap_cart(full=True))
 
 # Add a simple test route to check database (optional, can be removed later)
 @app.route('/test_db')
@@ -50,6 +397,172 @@ def test_db():
     except Exception as e:
         return f"Database connection failed: {str(e)}"
 
+# The catalog version shared by all worker processes: triggers on products bump it in
+# the writing transaction (see catalog_version.py), and checking it is nearly free.
+catalog_version = CatalogVersion(db_pool.connect)
+
+# Read cache for product lookups, list pages and search results. Entries are dropped
+# once the catalog version moves, whichever process wrote; catalog writes here also
+# call catalog_cache.bump() after committing so the change is picked up at once.
+catalog_cache = CatalogCache(
+    max_entries=int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.environ.get('CATALOG_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    version_source=catalog_version,
+)
+
+def catalog_response(entry):
+    # Clients must revalidate, but an unchanged catalog answers with an empty 304.
+    encoding = response_encoding(len(entry.body))
+    if encoding is None:
+        response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+    else:
+        # Compressed once per cache entry and encoding, not once per request.
+        body = entry.variants.get(encoding)
+        if body is None:
+            body = entry.variants[encoding] = compress(entry.body, encoding)
+        response = Response(body, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(entry.etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def cache_catalog_json(cache_key, data, version):
+    return catalog_response(catalog_cache.put(cache_key, app.json.dumps(data).encode('utf-8'), version))
+
+def load_product_names():
+    conn = db_pool.acquire()
+    try:
+        return conn.execute("SELECT id, name FROM products").fetchall()
+    finally:
+        conn.close()
+
+# Typeahead for the search box, answered from memory (GET /api/products/autocomplete).
+# Rebuilt only when products are added, renamed or removed (in any process): keyed on
+# the names-only version, so checkouts and price or stock edits do not rebuild it.
+product_names = PrefixIndex(load_product_names, version_source=catalog_version.names)
+
+def products_changed():
+    # Call after committing a catalog write. The index needs no nudge: the names
+    # version moved in the same transaction if any name did.
+    catalog_cache.bump()
+
+# Background product imports (POST /api/upload_products_excel with async=1).
+# Job status is also kept in IMPORT_JOB_DIR, so any worker process can answer a poll.
+import_jobs = ImportJobManager(db_pool.acquire, max_workers=int(os.environ.get('IMPORT_WORKERS', 1)),
+                               on_commit=products_changed, timings=observe_import_phase,
+                               state_dir=os.environ.get('IMPORT_JOB_DIR',
+                                                        os.path.join(tempfile.gettempdir(), 'store-import-jobs')))
+
+@app.route('/api/db/pool_stats')
+def db_pool_stats():
+    return jsonify(db_pool.stats())
+
+@app.route('/api/db/write_queue_stats')
+def write_queue_stats():
+    if write_queue is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **write_queue.stats()})
+
+@app.route('/api/cache/stats')
+def catalog_cache_stats():
+    return jsonify({**catalog_cache.stats(), 'autocomplete': product_names.stats()})
+
+def collect_scrape_values():
+    pool = db_pool.stats()
+    cache = catalog_cache.stats()
+    names = product_names.stats()
+    values = {
+        'store_db_pool_connections': ('Connections opened by the pool.', pool['created']),
+        'store_db_pool_in_use': ('Pooled connections currently checked out.', pool['in_use']),
+        'store_db_pool_timeouts_total': ('Acquires that timed out waiting for a connection.', pool['timeouts_total']),
+        'store_catalog_cache_entries': ('Responses held in the catalog cache.', cache['entries']),
+        'store_catalog_cache_bytes': ('Bytes held in the catalog cache.', cache['bytes']),
+        'store_catalog_cache_hits_total': ('Catalog cache hits.', cache['hits_total']),
+        'store_catalog_cache_misses_total': ('Catalog cache misses.', cache['misses_total']),
+        'store_autocomplete_names': ('Product names in the autocomplete index.', names['names']),
+        'store_autocomplete_builds_total': ('Autocomplete index (re)builds.', names['builds_total']),
+    }
+    if admission_classes:
+        classes = [admission.stats() for admission in admission_classes.values()]
+        values['store_admission_active'] = ('Requests holding an admission slot.', sum(c['active'] for c in classes))
+        values['store_admission_queued'] = ('Requests waiting for an admission slot.', sum(c['queued'] for c in classes))
+    if write_queue is not None:
+        queue_stats = write_queue.stats()
+        values['store_write_queue_depth'] = ('Writes waiting for the writer thread.', queue_stats['queued'])
+        values['store_write_queue_batches_total'] = ('Group commits made by the writer thread.', queue_stats['batches_total'])
+        values['store_write_queue_timeouts_total'] = ('Writes dropped because the writer did not start them in time.', queue_stats['timeouts_total'])
+    return values
+
+METRICS = (request_latency, request_count, request_errors, query_latency, pool_wait, import_phase,
+           admission_wait, admission_rejected, Collector(collect_scrape_values))
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(METRICS), mimetype='text/plain; version=0.0.4')
+
+# On-demand profiling of single requests, only when ADMIN_TOKEN is set. Send
+# X-Profile: cprofile|sample (or ?_profile=...) together with X-Admin-Token (or
+# ?admin_token=...); the response carries X-Profile-Id naming the saved profile.
+# Without ADMIN_TOKEN the hooks are not even registered, so normal requests pay nothing.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+profile_store = ProfileStore(
+    os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'store-profiles')),
+    max_files=int(os.environ.get('PROFILE_MAX_FILES', 200)),
+)
+
+def is_admin_request():
+    token = request.headers.get('X-Admin-Token') or request.args.get('admin_token')
+    return bool(ADMIN_TOKEN and token and secrets.compare_digest(token, ADMIN_TOKEN))
+
+def start_request_profile():
+    mode = request.headers.get('X-Profile') or request.args.get('_profile')
+    if mode is None or not is_admin_request():
+        return
+    g._profile = profile_store.start(mode.lower(), f'{request.method} {request.path}')
+
+def finish_request_profile(response):
+    active = g.pop('_profile', None)
+    if active is not None:
+        # Streamed bodies are produced after this point and are not included.
+        elapsed = active.stop()
+        response.headers['X-Profile-Id'] = active.name
+        response.headers['X-Profile-Seconds'] = f'{elapsed:.6f}'
+    return response
+
+def abandon_request_profile(exception):
+    active = g.pop('_profile', None)
+    if active is not None:
+        active.stop()
+
+if ADMIN_TOKEN:
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(abandon_request_profile)
+
+@app.route('/api/admin/profiles')
+def list_profiles():
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 403
+    return jsonify({'profiles': profile_store.list()})
+
+# Raw .pstats (load with pstats.Stats) or .collapsed (flamegraph.pl, speedscope);
+# ?format=text returns a cumulative-time summary of a .pstats profile instead.
+@app.route('/api/admin/profiles/<name>')
+def download_profile(name):
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 403
+    if request.args.get('format') == 'text':
+        summary = profile_store.summary(name)
+        if summary is None:
+            return jsonify({'error': 'Profile not found or not a cProfile profile'}), 404
+        return Response(summary, mimetype='text/plain')
+    path = profile_store.path(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=name)
+
 # POST /api/products
 @app.route('/api/products', methods=['POST'])
 def add_product():
@@ -63,13 +576,14 @@ def add_product():
     image_url = data.get('image_url')
     stock_quantity = data.get('stock_quantity', 0)
 
+    def insert_product(conn):
+        cursor = conn.execute("INSERT INTO products (name, description, price, image_url, stock_quantity) VALUES (?, ?, ?, ?, ?)",
+                              (name, description, price, image_url, stock_quantity))
+        return cursor.lastrowid
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO products (name, description, price, image_url, stock_quantity) VALUES (?, ?, ?, ?, ?)",
-                       (name, description, price, image_url, stock_quantity))
-        product_id = cursor.lastrowid
-        conn.commit()
+        product_id = run_write(insert_product)
+        products_changed()
         
         created_product = {
             'id': product_id,
@@ -79,28 +593,121 @@ def add_product():
             'image_url': image_url,
             'stock_quantity': stock_quantity
         }
-        # Important: Close connection after all operations for this request are done
-        conn.close() 
         return jsonify(created_product), 201
+    except sqlite3.IntegrityError:
+        return jsonify({'error': f"A product named '{name}' already exists"}), 409
     except sqlite3.Error as e:
-        if conn: conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
-        if conn: conn.close()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
+PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'stock_quantity')
+# Named rather than *, so internal columns (content_hash) stay out of responses.
+PRODUCT_COLUMNS_SQL = ', '.join(PRODUCT_FIELDS)
+PRODUCTS_PAGE_DEFAULT_LIMIT = 100
+PRODUCTS_PAGE_MAX_LIMIT = 1000
+PRODUCTS_STREAM_FORMATS = ('ndjson', 'json')
+PRODUCTS_STREAM_BATCH_SIZE = 500
+
+def parse_product_fields(fields_param):
+    # Returns the validated column list for ?fields=a,b,c ('id' is always included
+    # because it is the pagination key), or None if an unknown field was requested.
+    if not fields_param:
+        return list(PRODUCT_FIELDS)
+    requested = [f.strip() for f in fields_param.split(',') if f.strip()]
+    if any(f not in PRODUCT_FIELDS for f in requested):
+        return None
+    return ['id'] + [f for f in PRODUCT_FIELDS if f in requested and f != 'id']
+
+def stream_products(fields, after_id, limit, stream_format):
+    # Generator that encodes rows straight off the cursor in fixed-size batches, so
+    # memory stays flat regardless of catalog size.
+    sql = f"SELECT {', '.join(fields)} FROM products WHERE id > ? ORDER BY id"
+    params = [after_id]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        first = True
+        if stream_format == 'json':
+            yield '['
+        while True:
+            rows = cursor.fetchmany(PRODUCTS_STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            if stream_format == 'ndjson':
+                yield ''.join(json.dumps(dict(row)) + '\n' for row in rows)
+            else:
+                chunk = ','.join(json.dumps(dict(row)) for row in rows)
+                yield chunk if first else ',' + chunk
+            first = False
+        if stream_format == 'json':
+            yield ']'
+    finally:
+        conn.close()
+
+def load_products_page(conn, fields, after_id, limit):
+    # Fetch one extra row to know whether another page exists.
+    products_cursor = conn.execute(
+        f"SELECT {', '.join(fields)} FROM products WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, limit + 1)
+    )
+    products = [dict(row) for row in products_cursor.fetchall()]
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = products[-1]['id']
+    return {'products': products, 'next_cursor': next_cursor}
+
 # GET /api/products
+# Keyset-paginated: ?limit=N&cursor=<next_cursor from previous page>&fields=id,name,price
+# Add ?stream=ndjson or ?stream=json to stream every row from the cursor onwards instead.
 @app.route('/api/products', methods=['GET'])
 def get_products():
+    fields = parse_product_fields(request.args.get('fields', ''))
+    if fields is None:
+        return jsonify({'error': f"Invalid fields. Allowed: {', '.join(PRODUCT_FIELDS)}"}), 400
+
+    try:
+        after_id = int(request.args.get('cursor', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be integers'}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    stream_format = request.args.get('stream')
+    if stream_format:
+        if stream_format not in PRODUCTS_STREAM_FORMATS:
+            return jsonify({'error': f"Invalid stream format. Use one of: {', '.join(PRODUCTS_STREAM_FORMATS)}"}), 400
+        mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+        return Response(stream_with_context(stream_products(fields, after_id, limit, stream_format)),
+                        mimetype=mimetype)
+
+    limit = min(limit or PRODUCTS_PAGE_DEFAULT_LIMIT, PRODUCTS_PAGE_MAX_LIMIT)
+    cache_key = ('products', after_id, limit, tuple(fields))
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(cached)
+    version = catalog_cache.version
+
+    conn = None
     try:
         conn = get_db_connection()
-        products_cursor = conn.execute("SELECT * FROM products")
-        products = [dict(row) for row in products_cursor.fetchall()]
+        page = load_products_page(conn, fields, after_id, limit)
         conn.close()
-        return jsonify(products)
+        return cache_catalog_json(cache_key, page, version)
     except sqlite3.Error as e:
         if conn: conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
         if conn: conn.close()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
@@ -108,17 +715,26 @@ def get_products():
 # GET /api/products/<int:product_id>
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
+    cache_key = ('product', product_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(cached)
+    version = catalog_cache.version
+
+    conn = None
     try:
         conn = get_db_connection()
-        product_cursor = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,))
+        product_cursor = conn.execute(f"SELECT {PRODUCT_COLUMNS_SQL} FROM products WHERE id = ?", (product_id,))
         product = product_cursor.fetchone()
         conn.close()
         if product is None:
             return jsonify({'error': 'Product not found'}), 404
-        return jsonify(dict(product))
+        return cache_catalog_json(cache_key, dict(product), version)
     except sqlite3.Error as e:
         if conn: conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
         if conn: conn.close()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
@@ -129,32 +745,22 @@ def update_product(product_id):
     data = request.get_json()
     if not data:
         return jsonify({'error': 'No data provided for update'}), 400
-    
-    conn = None # Initialize conn to None for broader scope in try/except/finally
-    try:
-        conn = get_db_connection()
-        # First, check if product exists
-        product_cursor = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        product = product_cursor.fetchone()
 
+    # Name and price may be omitted (old values are kept) but not blanked.
+    if ('name' in data and not data['name']) or ('price' in data and data['price'] is None):
+        return jsonify({'error': 'Name and price are required and cannot be empty'}), 400
+
+    def apply_update(conn):
+        # Read and write in the same transaction so a concurrent update can't slip in between.
+        product = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
         if product is None:
-            conn.close()
-            return jsonify({'error': 'Product not found'}), 404
+            return None
 
         current_product = dict(product)
-        
-        # Ensure name and price are present if they are being updated, or retain old values
-        name = data.get('name', current_product['name'])
-        price = data.get('price', current_product['price'])
-
-        if not name or price is None: # Check for empty name or None price
-             conn.close()
-             return jsonify({'error': 'Name and price are required and cannot be empty'}), 400
-        
         updated_product_data = {
-            'name': name,
+            'name': data.get('name', current_product['name']),
             'description': data.get('description', current_product['description']),
-            'price': price,
+            'price': data.get('price', current_product['price']),
             'image_url': data.get('image_url', current_product['image_url']),
             'stock_quantity': data.get('stock_quantity', current_product['stock_quantity'])
         }
@@ -165,74 +771,213 @@ def update_product(product_id):
         conn.execute(sql, (updated_product_data['name'], updated_product_data['description'], 
                            updated_product_data['price'], updated_product_data['image_url'],
                            updated_product_data['stock_quantity'], product_id))
-        conn.commit()
+        return updated_product_data
+
+    try:
+        updated_product_data = run_write(apply_update)
+        if updated_product_data is None:
+            return jsonify({'error': 'Product not found'}), 404
+        products_changed()
         
         # Return the updated product data including its ID
-        response_data = {'id': product_id, **updated_product_data}
-        conn.close()
-        return jsonify(response_data)
+        return jsonify({'id': product_id, **updated_product_data})
 
+    except sqlite3.IntegrityError:
+        return jsonify({'error': f"A product named '{data.get('name')}' already exists"}), 409
     except sqlite3.Error as e:
-        if conn: conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
-        if conn: conn.close()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
 # DELETE /api/products/<int:product_id>
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
-    conn = None # Initialize conn to None
+    def apply_delete(conn):
+        cursor = conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        return cursor.rowcount
+
     try:
-        conn = get_db_connection()
-        # Check if product exists before deleting
-        product_cursor = conn.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        product = product_cursor.fetchone()
-        
-        if product is None:
-            conn.close()
+        if not run_write(apply_delete):
             return jsonify({'error': 'Product not found'}), 404
-
-        conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        conn.commit()
-        conn.close()
+        products_changed()
         return jsonify({'message': 'Product deleted successfully'}), 200 # Standard success
     except sqlite3.Error as e:
-        if conn: conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
-        if conn: conn.close()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
+# --- Bulk product writes ---
+# POST/PATCH/DELETE /api/products/bulk apply a whole batch in one transaction with
+# set-based lookups and executemany (see product_bulk.py). The body is
+# {"products": [...]} ({"ids": [...]} for DELETE) or, with Content-Type
+# application/x-ndjson, one item per line. Valid items are applied and failed ones
+# reported, unless ?atomic=1 asks for all-or-nothing. ?stream=ndjson streams one
+# result per line followed by a summary line instead of one JSON document.
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 100000))
+
+def parse_bulk_items(key):
+    # Returns (items, error_message).
+    if request.mimetype == 'application/x-ndjson':
+        items = []
+        for line_number, line in enumerate(request.get_data().splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                return None, f'Line {line_number} is not valid JSON'
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get(key), list):
+            return None, f"Body must be a JSON object with a '{key}' list"
+        items = data[key]
+    if not items:
+        return None, 'No items given'
+    if len(items) > BULK_MAX_ITEMS:
+        return None, f'At most {BULK_MAX_ITEMS} items per request'
+    return items, None
+
+def bulk_summary(results):
+    summary = {'total': len(results)}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return summary
+
+def bulk_response(results, status_code):
+    summary = bulk_summary(results)
+    if request.args.get('stream') == 'ndjson':
+        def generate():
+            for start in range(0, len(results), PRODUCTS_STREAM_BATCH_SIZE):
+                yield ''.join(json.dumps(result) + '\n' for result in results[start:start + PRODUCTS_STREAM_BATCH_SIZE])
+            yield json.dumps({'summary': summary}) + '\n'
+        return Response(generate(), status=status_code, mimetype='application/x-ndjson')
+    return jsonify({'summary': summary, 'results': results}), status_code
+
+def run_bulk(apply, items):
+    atomic = str(request.args.get('atomic', '')).lower() in ('1', 'true', 'yes')
+    try:
+        results = run_write(lambda conn: apply(conn, items, atomic=atomic), large=True)
+    except BulkItemErrors as e:
+        # Nothing was written; items that would have succeeded are marked as rolled back.
+        results = [result if result['status'] == 'error' else {'index': result['index'], 'status': 'rolled_back'}
+                   for result in e.results]
+        return bulk_response(results, 400)
+    except sqlite3.IntegrityError as e:
+        return jsonify({'error': f'Constraint violation, nothing was written: {str(e)}'}), 409
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    if any(result['status'] != 'error' for result in results):
+        products_changed()
+    return bulk_response(results, 200)
+
+@app.route('/api/products/bulk', methods=['POST'])
+def bulk_create_products():
+    items, error = parse_bulk_items('products')
+    if error:
+        return jsonify({'error': error}), 400
+    return run_bulk(bulk_create, items)
+
+@app.route('/api/products/bulk', methods=['PATCH'])
+def bulk_patch_products():
+    items, error = parse_bulk_items('products')
+    if error:
+        return jsonify({'error': error}), 400
+    return run_bulk(bulk_patch, items)
+
+@app.route('/api/products/bulk', methods=['DELETE'])
+def bulk_delete_products():
+    ids, error = parse_bulk_items('ids')
+    if error:
+        return jsonify({'error': error}), 400
+    # NDJSON lines may be bare ids or {"id": ...} objects.
+    ids = [item.get('id') if isinstance(item, dict) else item for item in ids]
+    return run_bulk(bulk_delete, ids)
+
+SEARCH_MODES = ('fts', 'substring')
+SEARCH_DEFAULT_LIMIT = 100
+SEARCH_MAX_LIMIT = 1000
+AUTOCOMPLETE_DEFAULT_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+def build_fts_query(query):
+    # Quote every word so user input can never be parsed as FTS5 syntax, and match on
+    # word prefixes so partial words ("diam") still find "Diamond Sword".
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def search_products_substring(conn, query, limit):
+    search_term = f"%{query}%"
+    return conn.execute(
+        f"SELECT {PRODUCT_COLUMNS_SQL} FROM products WHERE name LIKE ? OR description LIKE ? LIMIT ?",
+        (search_term, search_term, limit)
+    ).fetchall()
+
+def search_products_fts(conn, match_expression, limit):
+    # bm25() ranks best matches first (lower is better); matches in the name weigh more.
+    return conn.execute(
+        f"""SELECT {', '.join('products.' + field for field in PRODUCT_FIELDS)} FROM products_fts
+           JOIN products ON products.id = products_fts.rowid
+           WHERE products_fts MATCH ?
+           ORDER BY bm25(products_fts, 10.0, 1.0)
+           LIMIT ?""",
+        (match_expression, limit)
+    ).fetchall()
+
 @app.route('/api/products/search', methods=['GET'])
 def search_products():
     query = request.args.get('q', '').strip()
 
-    # Optional: Handle very short queries or empty queries if specific behavior is desired.
-    # For example, if query is empty, could return all products or an empty list.
-    # if not query:
-    #     return jsonify([]) # Return empty list if query is empty
+    # 'fts' (default) uses the ranked full-text index; 'substring' keeps the old LIKE '%q%' behaviour.
+    mode = request.args.get('mode', 'fts').lower()
+    if mode not in SEARCH_MODES:
+        return jsonify({'error': f"Invalid search mode. Use one of: {', '.join(SEARCH_MODES)}"}), 400
+
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    cache_key = ('search', query, mode, limit)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(cached)
+    version = catalog_cache.version
 
     conn = None 
     try:
         conn = get_db_connection()
-        search_term = f"%{query}%"
-        
-        products_cursor = conn.execute(
-            "SELECT * FROM products WHERE name LIKE ? OR description LIKE ?", 
-            (search_term, search_term)
-        )
-        products = [dict(row) for row in products_cursor.fetchall()]
+        match_expression = build_fts_query(query) if mode == 'fts' else ''
+
+        rows = None
+        if match_expression:
+            try:
+                rows = search_products_fts(conn, match_expression, limit)
+            except sqlite3.OperationalError as e:
+                # Database created before the FTS index existed (or SQLite built without FTS5):
+                # degrade to the substring scan rather than failing the search.
+                print(f"Full-text search unavailable, falling back to substring search: {e}")
+        if rows is None:
+            # Also used for empty/punctuation-only queries, which have no terms to match.
+            rows = search_products_substring(conn, query, limit)
+
+        products = [dict(row) for row in rows]
         # Connection is closed after fetching and before returning
         conn.close() 
         conn = None # Indicate connection is closed for the finally block
 
-        return jsonify(products)
+        return cache_catalog_json(cache_key, products, version)
 
     except sqlite3.Error as e:
         # Log error e server-side if possible
         # conn might be None if get_db_connection() failed, or already closed.
         return jsonify({'error': f'Database search error: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
         # Log error e server-side if possible
         return jsonify({'error': f'An unexpected error occurred during search: {str(e)}'}), 500
@@ -240,11 +985,32 @@ def search_products():
         if conn: # Only try to close if it wasn't set to None (i.e., closed successfully in try)
             conn.close()
 
-ALLOWED_EXTENSIONS = {'xlsx'}
+# GET /api/products/autocomplete?q=dia - name suggestions for the search box as you type.
+# Served from the in-memory prefix index, so keystrokes never reach SQLite.
+@app.route('/api/products/autocomplete', methods=['GET'])
+def autocomplete_products():
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+    try:
+        suggestions = product_names.suggest(query, limit)
+    except sqlite3.Error as e:
+        # Only the very first lookup reads the database (to build the index).
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    return jsonify({'query': query, 'suggestions': suggestions})
+
+# CSV and Parquet are much cheaper to parse than .xlsx; Parquet needs the optional pyarrow package.
+ALLOWED_EXTENSIONS = {'xlsx', 'csv', 'parquet'}
 
 def allowed_file(filename):
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+           file_extension(filename) in ALLOWED_EXTENSIONS
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower()
 
 @app.route('/api/upload_products_excel', methods=['POST'])
 def upload_products_excel():
@@ -257,116 +1023,161 @@ def upload_products_excel():
         return jsonify({'error': 'No selected file'}), 400
     
     if not file or not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed or missing. Only .xlsx is accepted.'}), 400
-
-    conn = None # Initialize for finally block
+        return jsonify({'error': 'File type not allowed or missing. Only .xlsx, .csv and .parquet are accepted.'}), 400
+
+    # With delete_missing=1 the file is the whole catalog: products not in it are deleted.
+    delete_missing = str(request.values.get('delete_missing', '')).lower() in ('1', 'true', 'yes')
+
+    # With async=1 the file is queued as a background job and a job id is returned at once;
+    # poll /api/import_jobs/<job_id> for progress and the final result.
+    if str(request.values.get('async', '')).lower() in ('1', 'true', 'yes'):
+        file_type = file_extension(file.filename)
+        fd, path = tempfile.mkstemp(prefix='product-import-', suffix=f'.{file_type}')
+        os.close(fd)
+        file.save(path)
+        job = import_jobs.submit(file.filename, file_type, path, delete_missing=delete_missing)
+        return jsonify({
+            'message': 'Import queued.',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('get_import_job', job_id=job.id)
+        }), 202
+
+    # pandas/openpyxl are only imported by the first upload, not at app start.
+    from product_import import ImportFileError, ImportRowErrors, import_product_chunks, read_product_chunks
     try:
         # Ensure the stream pointer is at the beginning
         file.stream.seek(0) 
-        # Try reading the file into a pandas DataFrame
-        df = pd.read_excel(file.stream)
-    except Exception as e:
-        return jsonify({'error': f'Failed to read Excel: {str(e)}'}), 400
+        # Rows are read lazily in fixed-size chunks, so memory stays bounded by the
+        # chunk size rather than by the size of the uploaded file.
+        chunks = read_product_chunks(file.stream, file_extension(file.filename))
+    except ImportFileError as e:
+        return jsonify({'error': str(e)}), 400
 
-    added_count = 0
-    updated_count = 0
-    row_errors = []
-    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        for index, row in df.iterrows():
-            row_number = index + 2  # Excel rows are typically 1-indexed, plus header
-            
-            current_row_name_for_error = row.get('Name', 'N/A') # For error reporting if name is missing
+        # Column-wise validation and content-hash comparison one chunk at a time, outside
+        # any write transaction; the new and changed rows are then applied in one short
+        # transaction, and nothing is written if any row had an error. Imports use their
+        # own connection rather than the write queue (the staged rows live on it).
+        result = import_product_chunks(get_db_connection(), chunks, timings=observe_import_phase,
+                                       delete_missing=delete_missing)
+        if result['added'] or result['updated'] or result['removed']:
+            products_changed()
+        return jsonify({
+            'message': 'Excel processed successfully.',
+            'added': result['added'],
+            'updated': result['updated'],
+            'unchanged': result['unchanged'],
+            'removed': result['removed'],
+            'rows': result['rows'],
+            'rows_written': result['rows_written'],
+            'elapsed_seconds': result['elapsed_seconds'],
+            'rows_per_sec': result['rows_per_sec'],
+            'phase_seconds': result['phase_seconds']
+        }), 200
+
+    except ImportRowErrors as e: # Nothing is imported if any row had an error
+        return jsonify({'error': 'Errors occurred during processing. No products were imported or updated due to issues in specific rows.', 'details': e.result['row_errors'], 'error_count': e.result['error_count']}), 400
+    except ImportFileError as e: # The file turned out to be unreadable part-way through
+        return jsonify({'error': str(e)}), 400
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
+    except Exception as e: # Catches errors from the main try block (e.g., db connection failure)
+        # This error is for issues outside the row-by-row processing, e.g., database connection failure
+        return jsonify({'error': f'An unexpected server error occurred: {str(e)}'}), 500
 
+@app.route('/api/import_jobs', methods=['GET'])
+def list_import_jobs():
+    return jsonify([job.to_dict() for job in import_jobs.list()])
+
+@app.route('/api/import_jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    job = import_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job.to_dict())
+
+# Carts live server-side; the session cookie only holds a short random cart_id.
+# CART_BACKEND=sqlite (default, shared by all workers) or memory (single process only).
+if os.environ.get('CART_BACKEND', 'sqlite').lower() == 'memory':
+    cart_store = MemoryCartStore()
+else:
+    cart_store = SQLiteCartStore(get_db_connection, max_age=app.permanent_session_lifetime.total_seconds())
+
+def get_cart_id(create=False):
+    cart_id = session.get('cart_id')
+    # Earlier versions of the app kept the whole cart in the cookie; move it over once.
+    legacy_cart = session.pop('cart', None)
+    if cart_id is None and (create or legacy_cart):
+        cart_id = secrets.token_urlsafe(16)
+        session['cart_id'] = cart_id
+        session.permanent = True # Make the session permanent as configured by app.permanent_session_lifetime
+    if legacy_cart:
+        for item_details in legacy_cart.values():
             try:
-                name = row.get('Name')
-                price_val = row.get('Price')
-
-                # Validation for Name
-                if pd.isna(name) or str(name).strip() == '':
-                    row_errors.append(f"Row {row_number}: 'Name' is missing or empty.")
-                    continue # Skip to the next row
-                name = str(name).strip()
-                current_row_name_for_error = name # Update for more specific error reporting
-
-                # Validation for Price
-                if pd.isna(price_val):
-                    row_errors.append(f"Row {row_number}: 'Price' is missing for product '{name}'.")
-                    continue
-                try:
-                    price = float(price_val)
-                except ValueError:
-                    row_errors.append(f"Row {row_number}: 'Price' for '{name}' ('{price_val}') is not a valid number.")
-                    continue
-
-                # Process Optional Fields (Stock Quantity, Description, Image URL)
-                stock_q_val = row.get('Stock Quantity')
-                if pd.isna(stock_q_val) or str(stock_q_val).strip() == '':
-                    stock_quantity = 0
-                else:
-                    try:
-                        stock_quantity = int(float(stock_q_val)) # float conversion handles "10.0" then int
-                    except ValueError:
-                        row_errors.append(f"Row {row_number}: 'Stock Quantity' for '{name}' ('{stock_q_val}') is not a valid integer.")
-                        continue
-                
-                desc_val = row.get('Description')
-                description = str(desc_val).strip() if not pd.isna(desc_val) else None
-                
-                img_val = row.get('Image URL')
-                image_url = str(img_val).strip() if not pd.isna(img_val) else None
-
-                # Database Operations
-                cursor.execute("SELECT id FROM products WHERE name = ?", (name,))
-                existing_product = cursor.fetchone()
-
-                if existing_product:
-                    cursor.execute("""UPDATE products SET description = ?, price = ?, image_url = ?, stock_quantity = ?
-                                      WHERE id = ?""", 
-                                   (description, price, image_url, stock_quantity, existing_product['id']))
-                    updated_count += 1
-                else:
-                    cursor.execute("""INSERT INTO products (name, description, price, image_url, stock_quantity)
-                                      VALUES (?, ?, ?, ?, ?)""", 
-                                   (name, description, price, image_url, stock_quantity))
-                    added_count += 1
-            
-            except KeyError as e: # Catches missing columns in the Excel file
-                # This error means the Excel sheet itself doesn't have an expected column header.
-                # It's a structural issue with the file, so it might be better to stop processing.
-                # For now, we'll record it as a row error and continue to see if other rows are okay,
-                # but this could be changed to a more global error.
-                row_errors.append(f"Row {row_number}: Missing expected column in Excel: {str(e)}. Required columns include 'Name', 'Price'.")
-                # If a critical column like 'Name' or 'Price' is what's missing, then the row processing would have failed earlier.
-                # This specific KeyError here implies an optional column might be missing, or an issue with .get() if not used properly.
-                # However, the current structure uses .get() which should prevent KeyErrors for optional fields.
-                # This catch might be for unexpected KeyErrors if direct access `row['Column']` was used somewhere.
-                # Given the use of .get(), a KeyError here is less likely unless it's from a malformed DataFrame.
-                # Let's refine the error message to be more general.
-                row_errors.append(f"Row {row_number}: Column access error: {str(e)}. Ensure Excel has 'Name' and 'Price' columns.")
-
-            except Exception as e: # Catches other errors for this specific row
-                row_errors.append(f"Row {row_number}: Error processing product '{current_row_name_for_error}': {str(e)}")
-        
-        # After iterating through all rows
-        if row_errors:
-            conn.rollback() # Rollback if any row had an error
-            return jsonify({'error': 'Errors occurred during processing. No products were imported or updated due to issues in specific rows.', 'details': row_errors}), 400
-        else:
-            conn.commit() # Commit only if all rows were processed successfully
-            return jsonify({'message': 'Excel processed successfully.', 'added': added_count, 'updated': updated_count}), 200
+                cart_store.add(cart_id, int(item_details['id']), int(item_details['quantity']))
+            except (ValueError, TypeError, KeyError):
+                pass
+    return cart_id
+
+def fetch_cart_products(product_ids):
+    # One WHERE id IN (...) lookup for any number of products; returns {id: row}.
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    placeholders = ','.join('?' * len(product_ids))
+    conn = get_db_connection()
+    rows = conn.execute(f"SELECT id, name, price, image_url FROM products WHERE id IN ({placeholders})",
+                        product_ids).fetchall()
+    return {row['id']: row for row in rows}
+
+def build_cart_items(quantities, products):
+    # Products deleted since they were added are left out.
+    return {
+        str(product_id): {
+            'id': product_id,
+            'name': products[product_id]['name'],
+            'price': products[product_id]['price'],
+            'quantity': quantity,
+            'image_url': products[product_id]['image_url']
+        }
+        for product_id, quantity in sorted(quantities.items())
+        if product_id in products
+    }
+
+def load_cart_items(cart_id):
+    # Joins the stored {product_id: quantity} pairs with current product details in one query.
+    quantities = cart_store.get(cart_id) if cart_id else {}
+    return build_cart_items(quantities, fetch_cart_products(quantities))
+
+def cart_item_count(cart_id):
+    # Same total as cart_summary()['total_items'] (products deleted since are left
+    # out) without loading the product details.
+    quantities = cart_store.get(cart_id) if cart_id else {}
+    if not quantities:
+        return 0
+    placeholders = ','.join('?' * len(quantities))
+    existing = get_db_connection().execute(f"SELECT id FROM products WHERE id IN ({placeholders})",
+                                           list(quantities)).fetchall()
+    return sum(quantities[row[0]] for row in existing)
+
+def cart_summary(cart_items):
+    total_price = 0.0 # Ensure float for price calculation
+    total_items = 0
+    for item_details in cart_items.values():
+        total_price += item_details['price'] * item_details['quantity']
+        total_items += item_details['quantity']
+    return {
+        'cart_items': cart_items,
+        'total_items': total_items,
+        'total_price': round(total_price, 2)
+    }
 
-    except Exception as e: # Catches errors from the main try block (e.g., db connection, initial df read)
-        if conn:
-            conn.rollback() # Ensure rollback on unexpected errors during the transaction phase
-        # This error is for issues outside the row-by-row processing, e.g., database connection failure
-        return jsonify({'error': f'An unexpected server error occurred: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close() # Always close the connection
+def parse_cart_product_id(product_id_str):
+    try:
+        return int(product_id_str)
+    except ValueError:
+        return None
 
 @app.route('/api/cart/add', methods=['POST'])
 def add_to_cart():
@@ -382,77 +1193,40 @@ def add_to_cart():
     except ValueError:
         return jsonify({'error': 'Invalid product_id or quantity format'}), 400
 
-    conn = None # Initialize conn for broader scope
-    product = None
     try:
         conn = get_db_connection()
-        product_cursor = conn.execute("SELECT id, name, price, image_url FROM products WHERE id = ?", (product_id,))
-        product = product_cursor.fetchone()
+        product = conn.execute("SELECT id FROM products WHERE id = ?", (product_id,)).fetchone()
+        if not product:
+            return jsonify({'error': 'Product not found'}), 404
+
+        cart_store.add(get_cart_id(create=True), product_id, quantity)
+        cart_items = load_cart_items(get_cart_id())
     except sqlite3.Error as e:
         # Log the error e server-side
-        if conn: conn.close() # Ensure connection is closed on DB error
-        return jsonify({'error': f'Database error while fetching product: {str(e)}'}), 500
-    finally:
-        if conn and product is None: # Close connection if product not found or other early exit in try
-            conn.close()
-        elif conn and product is not None: # Or just ensure it's closed if product was found
-             conn.close()
-
+        return jsonify({'error': f'Database error while updating cart: {str(e)}'}), 500
 
-    if not product:
-        return jsonify({'error': 'Product not found'}), 404
-
-    # Initialize cart if it doesn't exist
-    if 'cart' not in session:
-        session['cart'] = {}
-    
-    cart = session['cart']
-    product_id_str = str(product_id) # Use string keys for session cart items
-
-    if product_id_str in cart:
-        # Ensure quantity is a number before adding
-        cart[product_id_str]['quantity'] = int(cart[product_id_str].get('quantity', 0)) + quantity
-    else:
-        cart[product_id_str] = {
-            'id': product['id'], # Storing id can be useful on frontend
-            'name': product['name'],
-            'price': product['price'],
-            'quantity': quantity,
-            'image_url': product['image_url']
-        }
-    
-    session.permanent = True # Make the session permanent as configured by app.permanent_session_lifetime
-    session.modified = True # Mark session as modified to ensure it's saved
-    
-    return jsonify({'message': 'Product added to cart successfully!', 'cart': session['cart']}), 200
+    return jsonify({'message': 'Product added to cart successfully!', 'cart': cart_items}), 200
 
 @app.route('/api/cart', methods=['GET'])
 def view_cart():
-    cart_items = session.get('cart', {}) # Default to an empty dict if 'cart' not in session
-    
-    total_price = 0.0 # Ensure float for price calculation
-    total_items = 0
-    
-    for item_id, item_details in cart_items.items():
-        # Defensive: check if price and quantity exist and are numbers
-        price = item_details.get('price', 0)
-        quantity = item_details.get('quantity', 0)
-        
-        if not isinstance(price, (int, float)): price = 0.0
-        if not isinstance(quantity, int): quantity = 0
+    try:
+        return jsonify(cart_summary(load_cart_items(get_cart_id())))
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error while loading cart: {str(e)}'}), 500
 
-        total_price += price * quantity
-        total_items += quantity
-    
-    return jsonify({
-        'cart_items': cart_items, 
-        'total_items': total_items,
-        'total_price': round(total_price, 2)
-    })
+# GET /api/cart/count - just the number of items, for the nav badge.
+@app.route('/api/cart/count', methods=['GET'])
+def view_cart_count():
+    try:
+        return jsonify({'total_items': cart_item_count(get_cart_id())})
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error while loading cart: {str(e)}'}), 500
 
 @app.route('/api/cart/update/<product_id_str>', methods=['PUT'])
 def update_cart_item(product_id_str):
-    if 'cart' not in session or product_id_str not in session['cart']:
+    cart_id = get_cart_id()
+    product_id = parse_cart_product_id(product_id_str)
+    if cart_id is None or product_id is None or product_id not in cart_store.get(cart_id):
         return jsonify({'error': 'Item not found in cart'}), 404
 
     data = request.get_json()
@@ -461,72 +1235,106 @@ def update_cart_item(product_id_str):
 
     try:
         quantity = int(data['quantity'])
+    except ValueError:
+        return jsonify({'error': 'Invalid quantity format. Must be an integer.'}), 400
+
+    try:
+        # If quantity is 0 or less, it implies removing the item.
+        cart_store.set(cart_id, product_id, quantity)
         if quantity <= 0:
-            # If quantity is 0 or less, it implies removing the item.
-            # For this implementation, we will remove it directly.
-            # Alternative: return error and require using DELETE endpoint.
-            del session['cart'][product_id_str]
-            session.modified = True
             message = 'Item quantity updated to 0 and removed from cart.'
         else:
-            session['cart'][product_id_str]['quantity'] = quantity
-            session.modified = True
             message = 'Cart item quantity updated.'
-
-    except ValueError:
-        return jsonify({'error': 'Invalid quantity format. Must be an integer.'}), 400
-    
-    # Recalculate totals for the response
-    current_cart = session.get('cart', {})
-    total_price = 0.0
-    total_items = 0
-    for item_id, item_details in current_cart.items():
-        price = item_details.get('price', 0)
-        qty = item_details.get('quantity', 0)
-        if not isinstance(price, (int, float)): price = 0.0
-        if not isinstance(qty, int): qty = 0
-        total_price += price * qty
-        total_items += qty
-
-    return jsonify({
-        'message': message, 
-        'cart_items': current_cart,
-        'total_items': total_items,
-        'total_price': round(total_price, 2)
-    }), 200
+        return jsonify({'message': message, **cart_summary(load_cart_items(cart_id))}), 200
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error while updating cart: {str(e)}'}), 500
 
 @app.route('/api/cart/remove/<product_id_str>', methods=['DELETE'])
 def remove_from_cart(product_id_str):
-    if 'cart' not in session or product_id_str not in session['cart']:
+    cart_id = get_cart_id()
+    product_id = parse_cart_product_id(product_id_str)
+    if cart_id is None or product_id is None or product_id not in cart_store.get(cart_id):
         return jsonify({'error': 'Item not found in cart'}), 404
 
-    del session['cart'][product_id_str]
-    session.modified = True
+    try:
+        cart_store.remove(cart_id, product_id)
+        return jsonify({'message': 'Item removed from cart.', **cart_summary(load_cart_items(cart_id))}), 200
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error while updating cart: {str(e)}'}), 500
+
+CART_BATCH_OPERATIONS = ('add', 'set', 'remove')
+
+class InvalidCartOperations(Exception):
+    """At least one batch operation names a product that does not exist."""
+MAX_CART_BATCH_OPERATIONS = 500
+
+# POST /api/cart/batch
+# {"operations": [{"op": "add", "product_id": 1, "quantity": 2},
+#                 {"op": "set", "product_id": 2, "quantity": 5},
+#                 {"op": "remove", "product_id": 3}]}
+# Operations apply in order and atomically: if any is invalid, the cart is left unchanged,
+# and concurrent updates to the same cart wait rather than being overwritten.
+@app.route('/api/cart/batch', methods=['POST'])
+def batch_update_cart():
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Missing operations list'}), 400
+    if len(operations) > MAX_CART_BATCH_OPERATIONS:
+        return jsonify({'error': f'Too many operations (max {MAX_CART_BATCH_OPERATIONS})'}), 400
+
+    parsed = []
+    errors = []
+    for index, operation in enumerate(operations):
+        try:
+            op = operation['op']
+            product_id = int(operation['product_id'])
+            quantity = int(operation['quantity']) if op != 'remove' else 0
+        except (KeyError, TypeError, ValueError):
+            errors.append(f'Operation {index}: needs op, an integer product_id and (for add/set) an integer quantity.')
+            continue
+        if op not in CART_BATCH_OPERATIONS:
+            errors.append(f"Operation {index}: unknown op '{op}'. Use one of: {', '.join(CART_BATCH_OPERATIONS)}.")
+        elif op == 'add' and quantity <= 0:
+            errors.append(f'Operation {index}: quantity must be positive for add.')
+        else:
+            parsed.append((index, op, product_id, quantity))
+    if errors:
+        return jsonify({'error': 'Invalid cart operations. The cart was not changed.', 'details': errors}), 400
+
+    def apply_operations(quantities):
+        # Runs inside cart_store.apply(); raising leaves the cart unchanged.
+        # Details for every product in the cart or named by an operation, in a single query.
+        products = fetch_cart_products(set(quantities) | {product_id for _, _, product_id, _ in parsed})
+        for index, op, product_id, quantity in parsed:
+            if op != 'remove' and quantity > 0 and product_id not in products:
+                errors.append(f'Operation {index}: product {product_id} not found.')
+            elif op == 'add':
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            elif op == 'set' and quantity > 0:
+                quantities[product_id] = quantity
+            else: # remove, or set to 0 or less
+                quantities.pop(product_id, None)
+        if errors:
+            raise InvalidCartOperations()
+        return build_cart_items(quantities, products)
 
-    # Recalculate totals for the response
-    current_cart = session.get('cart', {})
-    total_price = 0.0
-    total_items = 0
-    for item_id, item_details in current_cart.items():
-        price = item_details.get('price', 0)
-        qty = item_details.get('quantity', 0)
-        if not isinstance(price, (int, float)): price = 0.0
-        if not isinstance(qty, int): qty = 0
-        total_price += price * qty
-        total_items += qty
-        
-    return jsonify({
-        'message': 'Item removed from cart.', 
-        'cart_items': current_cart,
-        'total_items': total_items,
-        'total_price': round(total_price, 2)
-    }), 200
+    try:
+        items = cart_store.apply(get_cart_id(create=True), apply_operations)
+        return jsonify({'message': 'Cart updated.', **cart_summary(items)}), 200
+    except InvalidCartOperations:
+        return jsonify({'error': 'Invalid cart operations. The cart was not changed.', 'details': errors}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error while updating cart: {str(e)}'}), 500
 
 @app.route('/api/cart/clear', methods=['POST'])
 def clear_cart(): # Renamed function to avoid conflict with any potential 'clear_cart' import/variable
-    if 'cart' in session: # Check if cart exists before trying to pop
-        session.pop('cart', None) # Remove cart from session; None if not found (though 'in' check handles this)
-        session.modified = True
+    cart_id = get_cart_id()
+    if cart_id is not None:
+        try:
+            cart_store.clear(cart_id)
+        except sqlite3.Error as e:
+            return jsonify({'error': f'Database error while clearing cart: {str(e)}'}), 500
     
     # Return the state of an empty cart
     return jsonify({
@@ -536,6 +1344,16 @@ def clear_cart(): # Renamed function to avoid conflict with any potential 'clear
         'total_price': 0.0
     }), 200
 
+class OutOfStockError(Exception):
+    """At least one order line asked for more than is in stock."""
+
+def fetch_stock_levels(product_ids):
+    placeholders = ','.join('?' * len(product_ids))
+    conn = get_db_connection()
+    rows = conn.execute(f"SELECT id, name, stock_quantity FROM products WHERE id IN ({placeholders})",
+                        product_ids).fetchall()
+    return {row['id']: row for row in rows}
+
 @app.route('/api/checkout/place_order', methods=['POST'])
 def place_order():
     data = request.get_json()
@@ -545,7 +1363,12 @@ def place_order():
     customer_name = data['customer_name']
     customer_email = data['customer_email']
 
-    cart = session.get('cart', {})
+    cart_id = get_cart_id()
+    try:
+        # Prices come from the products table, not from anything the client stored.
+        cart = load_cart_items(cart_id)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error placing order: {str(e)}'}), 500
     if not cart:
         return jsonify({'error': 'Your cart is empty. Cannot place order.'}), 400
 
@@ -564,38 +1387,52 @@ def place_order():
             return jsonify({'error': f"Invalid data for item {item_id_str} in cart."}), 500
     total_amount = round(total_amount, 2)
 
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    order_lines = [(int(item['id']), int(item['quantity']), float(item['price'])) for item in cart.values()]
+
+    def write_order(conn):
+        # Runs inside BEGIN IMMEDIATE, so no other checkout can interleave with it.
+        # One statement checks and decrements stock for every line; a line without
+        # enough stock matches no row, so a short rowcount means the order can't be filled.
+        placeholders = ', '.join('(?, ?)' for _ in order_lines)
+        params = [value for product_id, quantity, _ in order_lines for value in (product_id, quantity)]
+        conn.execute(
+            f"""WITH lines(product_id, quantity) AS (VALUES {placeholders})
+                UPDATE products SET stock_quantity = products.stock_quantity - lines.quantity
+                FROM lines
+                WHERE products.id = lines.product_id AND products.stock_quantity >= lines.quantity""",
+            params
+        )
+        # cursor.rowcount isn't reported for WITH-prefixed statements, so ask SQLite directly.
+        if conn.execute("SELECT changes()").fetchone()[0] != len(order_lines):
+            raise OutOfStockError()
 
         # Insert into orders table
-        cursor.execute(
+        cursor = conn.execute(
             "INSERT INTO orders (customer_name, customer_email, total_amount) VALUES (?, ?, ?)",
             (customer_name, customer_email, total_amount)
         )
         order_id = cursor.lastrowid
 
         # Insert into order_items table
-        for item_id_str, item_details in cart.items():
-            # Ensure item_details['id'] contains the numeric product ID,
-            # item_details['price'] is the price per item,
-            # and item_details['quantity'] is the quantity.
-            product_actual_id = int(item_details['id']) # The original product ID
-            item_price = float(item_details['price'])
-            item_quantity = int(item_details['quantity'])
-            
-            cursor.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
-                (order_id, product_actual_id, item_quantity, item_price)
-            )
-        
-        conn.commit()
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
+            [(order_id, product_id, quantity, price) for product_id, quantity, price in order_lines]
+        )
+        # Reporting rollups are updated in the same transaction, so they always match.
+        record_order(conn, order_id, order_lines)
+        return order_id
+
+    try:
+        order_id = run_write(write_order)
+        try:
+            catalog_cache.bump() # Stock levels changed
 
-        # Clear the cart from session
-        session.pop('cart', None)
-        session.modified = True
-        # Frontend should call updateCartCountDisplay() upon successful response
+            # Clear the server-side cart
+            cart_store.clear(cart_id)
+            # Frontend should call updateCartCountDisplay() upon successful response
+        except Exception as e:
+            # The order is committed: an error here must not make the client retry it.
+            print(f"Order {order_id} placed, but clearing up after it failed: {e}")
 
         return jsonify({
             'message': 'Order placed successfully!',
@@ -604,23 +1441,204 @@ def place_order():
             'total_amount': total_amount
         }), 201
 
+    except OutOfStockError:
+        # The transaction was rolled back; report current stock for the short lines.
+        products = fetch_stock_levels([product_id for product_id, _, _ in order_lines])
+        details = [
+            f"Only {products[product_id]['stock_quantity']} of '{products[product_id]['name']}' left in stock (requested {quantity})."
+            for product_id, quantity, _ in order_lines
+            if product_id in products and products[product_id]['stock_quantity'] < quantity
+        ]
+        return jsonify({'error': 'Not enough stock to place this order.', 'details': details}), 409
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         # Log e for server diagnosis (e.g., print(f"DB Error: {e}"))
         return jsonify({'error': f'Database error placing order: {str(e)}'}), 500
+    except DatabaseBusy:
+        raise # Answered with 503 by database_busy()
     except Exception as e:
-        if conn: conn.rollback()
         # Log e for server diagnosis (e.g., print(f"Unexpected Error: {e}"))
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
+
+# --- Exports ---
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Each export occupies a worker thread for the whole download; keep some for everyone else.
+export_slots = threading.BoundedSemaphore(int(os.environ.get('EXPORT_MAX_CONCURRENT', 2)))
+
+def export_response(dataset):
+    file_format = request.args.get('format', 'csv').lower()
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if not export_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many exports in progress, try again shortly'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    try:
+        # Rows are read batch by batch with a pooled connection borrowed per batch, not
+        # through the request's connection, which would stay checked out until the end.
+        chunks = export_chunks(db_pool.acquire, dataset, file_format)
+        response = Response(chunks, mimetype=EXPORT_MIMETYPES[file_format])
+    except BaseException:
+        export_slots.release()
+        raise
+    # Called once the server is done with the body, including when the client disconnects.
+    response.call_on_close(export_slots.release)
+    filename = f"{dataset}-{time.strftime('%Y%m%d-%H%M%S')}.{file_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# GET /api/export/products?format=csv|xlsx
+# Same columns as the upload expects (Name, Price, Stock Quantity, Description, Image URL),
+# so the file can be edited and re-uploaded through /api/upload_products_excel.
+@app.route('/api/export/products', methods=['GET'])
+def export_products():
+    return export_response('products')
+
+# GET /api/export/orders?format=csv|xlsx - one row per order line. Includes customer
+# details, so it needs the admin token.
+@app.route('/api/export/orders', methods=['GET'])
+def export_orders():
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 403
+    return export_response('orders')
+
+# --- Sales reports ---
+# Served from the rollup tables that checkout maintains (see sales_rollups.py), so they
+# never scan orders/order_items. Dates are UTC days, YYYY-MM-DD, both ends inclusive.
+REPORT_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+TOP_SELLERS_DEFAULT_LIMIT = 10
+TOP_SELLERS_MAX_LIMIT = 100
+
+def report_date_range():
+    start = request.args.get('from')
+    end = request.args.get('to')
+    for value in (start, end):
+        if value is not None and not REPORT_DATE_PATTERN.match(value):
+            return None
+    return start, end
+
+@app.route('/api/reports/sales/daily', methods=['GET'])
+def sales_daily_report():
+    date_range = report_date_range()
+    if date_range is None:
+        return jsonify({'error': "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+    try:
+        days = daily_sales(get_db_connection(), *date_range)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    return jsonify({
+        'days': days,
+        'orders': sum(day['orders'] for day in days),
+        'units': sum(day['units'] for day in days),
+        'revenue': round(sum(day['revenue'] for day in days), 2),
+    })
+
+@app.route('/api/reports/sales/products/<int:product_id>', methods=['GET'])
+def product_sales_report(product_id):
+    date_range = report_date_range()
+    if date_range is None:
+        return jsonify({'error': "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+    try:
+        days = product_sales(get_db_connection(), product_id, *date_range)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    return jsonify({
+        'product_id': product_id,
+        'days': days,
+        'units': sum(day['units'] for day in days),
+        'revenue': round(sum(day['revenue'] for day in days), 2),
+    })
+
+@app.route('/api/reports/top_sellers', methods=['GET'])
+def top_sellers_report():
+    date_range = report_date_range()
+    if date_range is None:
+        return jsonify({'error': "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+    by = request.args.get('by', 'revenue')
+    if by not in TOP_SELLER_METRICS:
+        return jsonify({'error': f"Invalid 'by'. Use one of: {', '.join(TOP_SELLER_METRICS)}"}), 400
+    try:
+        limit = min(int(request.args.get('limit', TOP_SELLERS_DEFAULT_LIMIT)), TOP_SELLERS_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    try:
+        products = top_sellers(get_db_connection(), by, limit, *date_range)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    return jsonify({'by': by, 'products': products})
+
+# Startup timings, filled in by create_app() and by the first request that follows it.
+startup_report = {}
+_init_lock = threading.Lock()
+MODULE_LOADED = time.perf_counter() # All routes above are registered by now
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def create_app():
+    """Return the initialised app; this is the entry point for gunicorn ('app:create_app()').
+
+    The first call makes sure the database schema exists and records how long startup
+    took. setup_database() only checks PRAGMA user_version when the schema is current,
+    so this stays cheap on every cold start. Later calls return the same app.
+    """
+    with _init_lock:
+        if startup_report:
+            return app
+        from database_setup import setup_database
+        setup_started = time.perf_counter()
+        schema_applied = setup_database()
+        ready = time.perf_counter()
+        startup_report.update({
+            'pid': os.getpid(),
+            'import_seconds': round(MODULE_LOADED - STARTUP_BEGAN, 4),
+            'setup_database_seconds': round(ready - setup_started, 4),
+            'schema_applied': schema_applied,
+            'ready_seconds': round(ready - STARTUP_BEGAN, 4),
+            'first_request_seconds': None,
+            'peak_rss_mb': peak_rss_mb(),
+            # Heavy optional modules should only show up here after an import has run.
+            'pandas_loaded': 'pandas' in sys.modules,
+            'openpyxl_loaded': 'openpyxl' in sys.modules,
+        })
+        print(f"Startup: ready in {startup_report['ready_seconds']}s "
+              f"(imports {startup_report['import_seconds']}s, database setup {startup_report['setup_database_seconds']}s), "
+              f"peak RSS {startup_report['peak_rss_mb']} MB")
+    return app
+
+@app.before_request
+def record_first_request():
+    # Time from module load to the first request being served, including any wait for
+    # the server to hand it over. Only the first request does more than a dict lookup.
+    if startup_report and startup_report['first_request_seconds'] is None:
+        with _init_lock:
+            if startup_report['first_request_seconds'] is None:
+                startup_report['first_request_seconds'] = round(time.perf_counter() - STARTUP_BEGAN, 4)
+                startup_report['first_request_path'] = request.path
+
+@app.route('/api/startup')
+def startup_stats():
+    report = dict(startup_report)
+    report['peak_rss_mb'] = peak_rss_mb()
+    report['pandas_loaded'] = 'pandas' in sys.modules
+    report['openpyxl_loaded'] = 'openpyxl' in sys.modules
+    return jsonify(report)
 
 if __name__ == '__main__':
-    # To ensure the database is created when the app starts for the first time (development)
-    # In a production environment, you'd run database_setup.py separately.
-    from database_setup import setup_database
-    setup_database()
+    # Creates the database on first start (development); under gunicorn the same
+    # happens through the create_app() factory.
+    create_app()
     # Development server configuration
     port = int(os.environ.get('PORT', 5000)) # Use PORT env var if available, else default to 5000
     # Debug mode should be False in production. 
@@ -0,0 +1,60 @@
+"""Cold-start benchmark.
+
+Starts a fresh interpreter per run that imports the app, calls create_app() and
+serves one request through the Flask test client, then prints the app's own
+startup report (GET /api/startup) plus the wall time of the whole process as JSON.
+Useful for spotting regressions such as a heavy module imported at app load.
+
+    python bench/cold_start.py --runs 5 --path /api/products
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys
+sys.path.insert(0, {root!r})
+import app as store_app
+client = store_app.create_app().test_client()
+client.get({path!r})
+print(client.get('/api/startup').get_data(as_text=True))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/products', help='first request to serve')
+    args = parser.parse_args()
+
+    # The app uses ./store.db, so run against a throwaway database. The first run
+    # creates the schema; the rest measure the usual already-initialised start.
+    workdir = tempfile.mkdtemp(prefix='cold-start-')
+    code = CHILD.format(root=REPO_ROOT, path=args.path)
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], cwd=workdir, check=True,
+                                capture_output=True, text=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        report['process_seconds'] = round(time.perf_counter() - started, 4)
+        runs.append(report)
+
+    warm = runs[1:] or runs
+    print(json.dumps({
+        'runs': runs,
+        'median_ready_seconds': statistics.median(r['ready_seconds'] for r in warm),
+        'median_first_request_seconds': statistics.median(r['first_request_seconds'] for r in warm),
+        'median_process_seconds': statistics.median(r['process_seconds'] for r in warm),
+        'max_peak_rss_mb': max((r['peak_rss_mb'] or 0) for r in runs),
+        'pandas_loaded': any(r['pandas_loaded'] for r in runs),
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Flash-sale checkout benchmark.
+
+Many shoppers race to buy a product with limited stock through the real
+/api/cart/add and /api/checkout/place_order endpoints (Flask test client, one
+client per shopper, a thread pool driving them concurrently). Reports checkout
+throughput and exits non-zero if more units were sold than were in stock.
+
+    python bench/flash_sale.py --shoppers 400 --stock 100 --threads 16
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shoppers', type=int, default=400)
+    parser.add_argument('--stock', type=int, default=100)
+    parser.add_argument('--quantity', type=int, default=1, help='units each shopper tries to buy')
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    # The app uses ./store.db, so run against a throwaway database.
+    os.chdir(tempfile.mkdtemp(prefix='flash-sale-'))
+    # Every shopper is the same test client address and more checkouts run at once than
+    # the checkout class admits; this measures the write path, so admission is off.
+    os.environ.setdefault('ADMISSION_CONTROL', 'off')
+    sys.path.insert(0, REPO_ROOT)
+    from database_setup import setup_database
+    setup_database()
+    import app as store_app
+
+    client = store_app.app.test_client()
+    product_id = client.post('/api/products', json={
+        'name': 'Limited Edition Elytra', 'price': 99.0, 'stock_quantity': args.stock
+    }).get_json()['id']
+
+    def shop(_):
+        shopper = store_app.app.test_client()
+        shopper.post('/api/cart/add', json={'product_id': product_id, 'quantity': args.quantity})
+        started = time.perf_counter()
+        response = shopper.post('/api/checkout/place_order', json={
+            'customer_name': 'Steve', 'customer_email': 'steve@example.com'
+        })
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(shop, range(args.shoppers)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+
+    conn = sqlite3.connect('store.db')
+    stock_left = conn.execute("SELECT stock_quantity FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+    units_sold = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE product_id = ?",
+                              (product_id,)).fetchone()[0]
+    conn.close()
+
+    print(f"shoppers={args.shoppers} stock={args.stock} threads={args.threads}")
+    print(f"responses by status: {statuses}")
+    print(f"checkouts/sec: {args.shoppers / elapsed:.1f}  "
+          f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+    print(f"units sold: {units_sold}  stock left: {stock_left}")
+
+    expected_sold = min(args.stock // args.quantity, args.shoppers) * args.quantity
+    if units_sold + stock_left != args.stock or stock_left < 0 or units_sold != expected_sold:
+        print("FAIL: stock and sales do not reconcile (oversold or lost orders)")
+        return 1
+    print("OK: no overselling")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Daily re-import benchmark.
+
+Writes a synthetic supplier file (bench/seed.py's catalog) as CSV, imports it
+once, then re-imports it with a given share of rows changed and reports the
+import's counts, its time (total and write phase), whether it moved the catalog
+version (which invalidates every worker's caches), how many bytes it wrote to the
+database (WAL and checkpoints, from /proc/self/io on Linux) and how often a probe
+trying to take the write lock every 10ms found it held meanwhile, as JSON.
+Run it on two revisions to compare; the first import is the baseline load.
+
+    python bench/reimport.py --products 100000 --changed 0.01
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'bench'))
+
+from seed import product_rows
+
+def catalog_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['Name', 'Description', 'Price', 'Image URL', 'Stock Quantity'])
+    writer.writerows(rows)
+    return out.getvalue().encode('utf-8')
+
+def bytes_written():
+    # wchar counts every byte passed to write(); the WAL file size alone is no measure,
+    # since the auto-checkpoint lets the WAL wrap around every ~4MB.
+    try:
+        with open('/proc/self/io') as f:
+            return int(dict(line.split(': ') for line in f.read().splitlines())['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+class WriterProbe:
+    """Tries BEGIN IMMEDIATE without waiting every 10ms; counts how often the lock was held."""
+
+    def __init__(self, database):
+        self.database = database
+        self.attempts = 0
+        self.blocked = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+
+    def _run(self):
+        conn = sqlite3.connect(self.database, timeout=0, isolation_level=None)
+        while not self._stop.is_set():
+            self.attempts += 1
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('ROLLBACK')
+            except sqlite3.OperationalError:
+                self.blocked += 1
+            time.sleep(0.01)
+        conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--changed', type=float, default=0.01, help='share of rows changed in the re-import')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # The app uses ./store.db, so run against a throwaway database.
+    os.chdir(tempfile.mkdtemp(prefix='reimport-'))
+    os.environ.setdefault('ADMISSION_CONTROL', 'off')
+    sys.path.insert(0, REPO_ROOT)
+    import app as store_app
+    client = store_app.create_app().test_client()
+
+    rows = list(product_rows(args.products, args.seed))
+    rng = random.Random(args.seed)
+    changed = [list(row) for row in rows]
+    for index in rng.sample(range(len(changed)), int(len(changed) * args.changed)):
+        changed[index][4] += 1 # Stock Quantity
+
+    def upload(body, filename):
+        written = bytes_written()
+        started = time.perf_counter()
+        response = client.post('/api/upload_products_excel', data={'excel_file': (io.BytesIO(body), filename)})
+        elapsed = time.perf_counter() - started
+        return response, elapsed, (bytes_written() - written if written is not None else None)
+
+    def run_import(body):
+        # The same upload with a rejected extension: what spooling the request costs alone.
+        _, _, spooled = upload(body, 'catalog.txt')
+        version = store_app.catalog_version()
+        with WriterProbe(store_app.DATABASE_NAME) as probe:
+            response, elapsed, written = upload(body, 'catalog.csv')
+        result = response.get_json()
+        return {
+            'status': response.status_code,
+            'seconds': round(elapsed, 3),
+            'write_seconds': result.get('phase_seconds', {}).get('write'),
+            'database_bytes_written': written - spooled if written is not None else None,
+            'catalog_version_changed': store_app.catalog_version() != version,
+            'writer_probe': {'attempts': probe.attempts, 'blocked': probe.blocked},
+            **{key: result.get(key) for key in ('added', 'updated', 'unchanged', 'removed')},
+        }
+
+    print(json.dumps({
+        'products': args.products,
+        'changed_share': args.changed,
+        'initial_import': run_import(catalog_csv(rows)),
+        'reimport': run_import(catalog_csv(changed)),
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
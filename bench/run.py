@@ -0,0 +1,343 @@
+"""Load and benchmark runner for the store API.
+
+Drives the real endpoints either in-process through the Flask test client
+(default) or over HTTP against a running server (e.g. a local gunicorn), and
+writes p50/p95/p99 latency, throughput and peak RSS per scenario to a JSON file
+that can be diffed between runs.
+
+    python bench/seed.py --products 100000 --db /tmp/bench/store.db
+    python bench/run.py --db /tmp/bench/store.db --concurrency 8 --duration 10 --output before.json
+
+    # against gunicorn started in the database's directory:
+    python bench/run.py --url http://127.0.0.1:8000 --server-pid 12345 --output after.json
+
+Scenarios: list, get, search, cart, checkout, upload (default: all).
+"""
+import argparse
+import http.cookiejar
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_TERMS = ['diamond', 'iron pickaxe', 'enchanted', 'netherite sword', 'boots', 'ancient helm*',
+                'golden', 'mending', 'copper lantern', 'trident']
+
+class TestClientTarget:
+    """In-process target; one test client per session so each has its own cookie."""
+
+    def __init__(self, db_path):
+        # The app opens ./store.db, so run from the database's directory.
+        os.chdir(os.path.dirname(os.path.abspath(db_path)))
+        # All sessions share one client address; measure capacity, not the admission limits.
+        os.environ.setdefault('ADMISSION_CONTROL', 'off')
+        sys.path.insert(0, REPO_ROOT)
+        import app as store_app
+        self.app = store_app.create_app()
+
+    def session(self):
+        client = self.app.test_client()
+
+        def request(method, path, json_body=None, files=None):
+            kwargs = {}
+            if json_body is not None:
+                kwargs['json'] = json_body
+            if files is not None:
+                kwargs['data'] = {name: (io.BytesIO(content), filename) for name, (filename, content) in files.items()}
+                kwargs['content_type'] = 'multipart/form-data'
+            response = client.open(path, method=method, **kwargs)
+            return response.status_code, response.get_data()
+        return request
+
+    def peak_rss_mb(self):
+        return own_peak_rss_mb()
+
+class HttpTarget:
+    """A running server; one cookie jar per session."""
+
+    def __init__(self, base_url, server_pid=None):
+        self.base_url = base_url.rstrip('/')
+        self.server_pid = server_pid
+
+    def session(self):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def request(method, path, json_body=None, files=None):
+            headers = {}
+            body = None
+            if json_body is not None:
+                body = json.dumps(json_body).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+            elif files is not None:
+                body, headers['Content-Type'] = encode_multipart(files)
+            req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+            try:
+                with opener.open(req, timeout=60) as response:
+                    return response.status, response.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+        return request
+
+    def peak_rss_mb(self):
+        if not self.server_pid:
+            return None
+        return process_tree_peak_rss_mb(self.server_pid)
+
+def encode_multipart(files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def own_peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def process_tree_peak_rss_mb(pid):
+    # Peak RSS (VmHWM) of a gunicorn master and its workers, from /proc (Linux only).
+    pids = [pid]
+    try:
+        children = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout.split()
+        pids += [int(child) for child in children]
+    except OSError:
+        pass
+    total_kb = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            return None
+    return round(total_kb / 1024, 1)
+
+# Each scenario step takes (request, context) and returns a list of (status, latency)
+# for the requests it made; context carries product ids discovered during setup.
+
+def timed(request, method, path, **kwargs):
+    started = time.perf_counter()
+    status, body = request(method, path, **kwargs)
+    return status, time.perf_counter() - started, body
+
+def scenario_list(request, ctx, rng):
+    # Walk a few keyset pages, like a client scrolling the catalog.
+    results = []
+    cursor = None
+    for _ in range(3):
+        path = '/api/products?limit=50' + (f'&cursor={cursor}' if cursor else '')
+        status, latency, body = timed(request, 'GET', path)
+        results.append((status, latency))
+        if status != 200:
+            break
+        cursor = json.loads(body).get('next_cursor')
+        if not cursor:
+            break
+    return results
+
+def scenario_get(request, ctx, rng):
+    status, latency, _ = timed(request, 'GET', f'/api/products/{rng.choice(ctx["product_ids"])}')
+    return [(status, latency)]
+
+def scenario_search(request, ctx, rng):
+    term = urllib.request.quote(rng.choice(SEARCH_TERMS))
+    status, latency, _ = timed(request, 'GET', f'/api/products/search?q={term}&limit=20')
+    return [(status, latency)]
+
+def scenario_cart(request, ctx, rng):
+    results = []
+    product_ids = rng.sample(ctx['product_ids'], 3)
+    for product_id in product_ids:
+        status, latency, _ = timed(request, 'POST', '/api/cart/add', json_body={'product_id': product_id, 'quantity': 1})
+        results.append((status, latency))
+    status, latency, _ = timed(request, 'PUT', f'/api/cart/update/{product_ids[0]}', json_body={'quantity': 2})
+    results.append((status, latency))
+    status, latency, _ = timed(request, 'GET', '/api/cart')
+    results.append((status, latency))
+    status, latency, _ = timed(request, 'POST', '/api/cart/clear')
+    results.append((status, latency))
+    return results
+
+def scenario_checkout(request, ctx, rng):
+    product_id = rng.choice(ctx['product_ids'])
+    request('POST', '/api/cart/add', json_body={'product_id': product_id, 'quantity': 1})
+    status, latency, _ = timed(request, 'POST', '/api/checkout/place_order',
+                               json_body={'customer_name': 'Bench', 'customer_email': 'bench@example.com'})
+    return [(status, latency)]
+
+def scenario_upload(request, ctx, rng):
+    rows = ['Name,Price,Stock Quantity,Description']
+    batch = rng.randrange(1 << 30)
+    for n in range(ctx['upload_rows']):
+        rows.append(f'Bench Upload {batch}-{n},{rng.uniform(1, 100):.2f},{rng.randint(0, 50)},bench row')
+    content = ('\n'.join(rows) + '\n').encode('utf-8')
+    status, latency, _ = timed(request, 'POST', '/api/upload_products_excel',
+                               files={'excel_file': ('bench.csv', content)})
+    return [(status, latency)]
+
+# Non-2xx statuses that are a normal outcome rather than an error.
+EXPECTED_STATUSES = {
+    'checkout': {409}, # sold out: a valid answer from a stock-checked checkout
+}
+
+SCENARIOS = {
+    'list': scenario_list,
+    'get': scenario_get,
+    'search': scenario_search,
+    'cart': scenario_cart,
+    'checkout': scenario_checkout,
+    'upload': scenario_upload,
+}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_scenario(target, name, ctx, concurrency, duration, iterations, seed):
+    step = SCENARIOS[name]
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    remaining = [iterations]
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        request = target.session()
+        local = []
+        while time.perf_counter() < deadline:
+            if iterations:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            local.extend(step(request, ctx, rng))
+        with lock:
+            results.extend(local)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    expected = EXPECTED_STATUSES.get(name, set())
+    errors = sum(count for status, count in statuses.items() if int(status) >= 400 and int(status) not in expected)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'statuses': statuses,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(results) / elapsed, 1) if elapsed > 0 else None,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'mean': ms(statistics.fmean(latencies)) if latencies else None,
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'peak_rss_mb': target.peak_rss_mb(),
+    }
+
+def discover_product_ids(target, limit):
+    request = target.session()
+    ids = []
+    cursor = None
+    while len(ids) < limit:
+        status, body = request('GET', '/api/products?limit=1000' + (f'&cursor={cursor}' if cursor else ''))
+        if status != 200:
+            raise SystemExit(f'GET /api/products failed with {status}: {body[:200]!r}')
+        page = json.loads(body)
+        ids += [product['id'] for product in page['products']]
+        cursor = page.get('next_cursor')
+        if not cursor:
+            break
+    if not ids:
+        raise SystemExit('The catalog is empty; seed it first with bench/seed.py.')
+    return ids[:limit]
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(REPO_ROOT, 'bench', 'data', 'store.db'),
+                        help='seeded database for the in-process target')
+    parser.add_argument('--url', help='benchmark a running server instead, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--server-pid', type=int, help='server (gunicorn master) pid, to report its peak RSS')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    parser.add_argument('--iterations', type=int, default=0, help='stop a scenario after this many iterations (0 = duration only)')
+    parser.add_argument('--upload-rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench-results.json')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    output = os.path.abspath(args.output)
+    if args.url:
+        target = HttpTarget(args.url, args.server_pid)
+    else:
+        if not os.path.exists(args.db):
+            parser.error(f'{args.db} does not exist; create it with bench/seed.py')
+        target = TestClientTarget(args.db)
+
+    ctx = {'product_ids': discover_product_ids(target, 10000), 'upload_rows': args.upload_rows}
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'target': args.url or 'flask-test-client',
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'iterations': args.iterations,
+            'catalog_sample': len(ctx['product_ids']),
+        },
+        'scenarios': {},
+    }
+    for name in names:
+        result = run_scenario(target, name, ctx, args.concurrency, args.duration, args.iterations, args.seed)
+        report['scenarios'][name] = result
+        latency = result['latency_ms']
+        print(f"{name:10s} {result['throughput_rps']:>9} req/s  p50={latency['p50']}ms  p95={latency['p95']}ms  "
+              f"p99={latency['p99']}ms  errors={result['errors']}  peak_rss={result['peak_rss_mb']}MB")
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'Wrote {output}')
+
+if __name__ == '__main__':
+    main()
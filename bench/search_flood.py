@@ -0,0 +1,108 @@
+"""Search flood benchmark for admission control.
+
+Starts gunicorn on a seeded throwaway database, floods /api/products/search from
+many threads and meanwhile places orders from a few shoppers, then reports checkout
+latency and the status codes each side got. Runs once per mode:
+
+    off          ADMISSION_CONTROL=off (the old behaviour)
+    concurrency  admission on, per-client rate limits off (ADMISSION_READ rate=0),
+                 so only the read class's concurrency and queue limits apply
+    on           the default limits, including the per-client rate on searches
+                 (checkout's rate is off: the shoppers share one address here)
+
+    python bench/search_flood.py --flood 32 --shoppers 2 --duration 10
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'bench'))
+
+from run import HttpTarget, discover_product_ids, percentile, scenario_checkout, scenario_search
+from seed import seed
+from worker_scaling import free_port, wait_until_ready
+
+MODES = {
+    'off': {'ADMISSION_CONTROL': 'off'},
+    'concurrency': {'ADMISSION_CONTROL': 'on', 'ADMISSION_READ': 'rate=0', 'ADMISSION_CHECKOUT': 'rate=0'},
+    'on': {'ADMISSION_CONTROL': 'on', 'ADMISSION_CHECKOUT': 'rate=0'},
+}
+
+def run_mode(workdir, mode, args):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, WEB_CONCURRENCY='1', **MODES[mode])
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--threads', str(args.threads),
+         '--timeout', '30', '--backlog', '2048', 'app:create_app()'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(url)
+        target = HttpTarget(url)
+        ctx = {'product_ids': discover_product_ids(target, 1000)}
+        stop = threading.Event()
+        lock = threading.Lock()
+        search_statuses = {}
+        checkout_statuses = {}
+        checkout_latencies = []
+
+        def flood(worker_id):
+            request, rng = target.session(), random.Random(worker_id)
+            while not stop.is_set():
+                for status, _ in scenario_search(request, ctx, rng):
+                    with lock:
+                        search_statuses[status] = search_statuses.get(status, 0) + 1
+
+        def shop(worker_id):
+            request, rng = target.session(), random.Random(10000 + worker_id)
+            while not stop.is_set():
+                for status, latency in scenario_checkout(request, ctx, rng):
+                    with lock:
+                        checkout_statuses[status] = checkout_statuses.get(status, 0) + 1
+                        checkout_latencies.append(latency)
+
+        threads = [threading.Thread(target=flood, args=(i,)) for i in range(args.flood)]
+        threads += [threading.Thread(target=shop, args=(i,)) for i in range(args.shoppers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        latencies = sorted(latency * 1000 for latency in checkout_latencies)
+        return {
+            'search_statuses': search_statuses,
+            'checkout_statuses': checkout_statuses,
+            'checkout_ms': {name: round(percentile(latencies, fraction), 1) if latencies else None
+                            for name, fraction in (('p50', 0.50), ('p99', 0.99), ('max', 1.0))},
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated subset of: ' + ', '.join(MODES))
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads')
+    parser.add_argument('--flood', type=int, default=32, help='threads searching as fast as they can')
+    parser.add_argument('--shoppers', type=int, default=2, help='threads placing orders')
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='search-flood-')
+    seed(os.path.join(workdir, 'store.db'), args.products)
+    results = {mode.strip(): run_mode(workdir, mode.strip(), args) for mode in args.modes.split(',') if mode.strip()}
+    print(json.dumps({'flood_threads': args.flood, 'shoppers': args.shoppers, 'gunicorn_threads': args.threads,
+                      'duration_seconds': args.duration, 'modes': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Seed a store database with a synthetic catalog.
+
+Products get deterministic names built from a fixed vocabulary, so the same
+--products and --seed always produce the same catalog and search terms such as
+"diamond" or "pickaxe" match a predictable share of it.
+
+    python bench/seed.py --products 100000 --db /tmp/bench/store.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MATERIALS = ['Wooden', 'Stone', 'Iron', 'Golden', 'Diamond', 'Netherite', 'Copper', 'Emerald']
+ITEMS = ['Sword', 'Pickaxe', 'Axe', 'Shovel', 'Hoe', 'Helmet', 'Chestplate', 'Leggings', 'Boots',
+         'Bow', 'Crossbow', 'Shield', 'Trident', 'Lantern', 'Bucket', 'Compass']
+QUALITIES = ['Worn', 'Sturdy', 'Enchanted', 'Ancient', 'Polished', 'Cursed', 'Legendary', 'Rusty']
+DESCRIPTION_WORDS = ['mines', 'ore', 'blocks', 'faster', 'durable', 'glowing', 'forged', 'in', 'the',
+                     'nether', 'end', 'village', 'mob', 'protection', 'sharpness', 'efficiency',
+                     'unbreaking', 'mending', 'crafted', 'by', 'a', 'skilled', 'smith']
+
+INSERT_BATCH_SIZE = 10000
+
+def product_rows(count, seed):
+    rng = random.Random(seed)
+    for n in range(1, count + 1):
+        name = f"{rng.choice(QUALITIES)} {rng.choice(MATERIALS)} {rng.choice(ITEMS)} #{n}"
+        description = ' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(6, 16)))
+        price = round(rng.uniform(0.5, 500.0), 2)
+        yield (name, description, price, f"/static/img/{n % 97}.png", rng.randint(0, 1000))
+
+def seed(db_path, products, seed_value=42, reset=False):
+    db_path = os.path.abspath(db_path)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if reset:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    sys.path.insert(0, REPO_ROOT)
+    import database_setup
+    database_setup.DATABASE_NAME = db_path
+    database_setup.setup_database()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF') # a seed run is disposable
+    existing = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    if existing:
+        conn.close()
+        print(f"{db_path} already has {existing} products; use --reset to reseed.")
+        return existing
+
+    started = time.perf_counter()
+    rows = product_rows(products, seed_value)
+    inserted = 0
+    while inserted < products:
+        batch = [row for _, row in zip(range(INSERT_BATCH_SIZE), rows)]
+        conn.executemany("""INSERT INTO products (name, description, price, image_url, stock_quantity)
+                            VALUES (?, ?, ?, ?, ?)""", batch)
+        conn.commit()
+        inserted += len(batch)
+    conn.execute('ANALYZE')
+    conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {inserted} products into {db_path} in {elapsed:.1f}s ({inserted / elapsed:.0f} rows/s).")
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000, help='catalog size, e.g. 10000 to 1000000')
+    parser.add_argument('--db', default=os.path.join(REPO_ROOT, 'bench', 'data', 'store.db'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='delete the database first')
+    args = parser.parse_args()
+    seed(args.db, args.products, args.seed, args.reset)
+
+if __name__ == '__main__':
+    main()
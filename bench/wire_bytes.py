@@ -0,0 +1,80 @@
+"""Bytes-on-the-wire benchmark for page assets and catalog JSON.
+
+Fetches the home page's static assets and typical catalog responses through the
+Flask test client twice: as a client that sends no Accept-Encoding and requests
+the original static paths (the old behaviour), and as a browser that accepts
+brotli/gzip and follows the fingerprinted links from base.html. Prints bytes per
+resource and in total, and optionally writes them as JSON.
+
+    python build_assets.py
+    python bench/seed.py --products 10000 --db /tmp/bench/store.db
+    python bench/wire_bytes.py --db /tmp/bench/store.db --output wire.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JSON_PATHS = [
+    '/api/products?limit=100',
+    '/api/products?limit=1000',
+    '/api/products/search?q=diamond',
+    '/api/products/search?q=sword&limit=500',
+    '/api/reports/top_sellers',
+]
+
+def fetch_bytes(client, path, headers):
+    response = client.get(path, headers=headers)
+    size = len(response.get_data())
+    encoding = response.headers.get('Content-Encoding', 'identity')
+    response.close()
+    return response.status_code, size, encoding
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(REPO_ROOT, 'bench', 'data', 'store.db'))
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f'{args.db} does not exist; create it with bench/seed.py')
+
+    output = os.path.abspath(args.output) if args.output else None
+    # The app opens ./store.db, so run from the database's directory.
+    os.chdir(os.path.dirname(os.path.abspath(args.db)))
+    sys.path.insert(0, REPO_ROOT)
+    import app as store_app
+    client = store_app.create_app().test_client()
+
+    html = client.get('/').get_data(as_text=True)
+    page_assets = re.findall(r'(?:href|src)="/static/([^"]+)"', html)
+    if not store_app.asset_manifest:
+        print("No static/dist/manifest.json; run build_assets.py to measure fingerprinted assets.")
+    # (before, after) pairs: the page's links resolve to built copies of the originals.
+    originals = {built: source for source, built in store_app.asset_manifest.items()}
+    pairs = [('/static/' + originals.get(asset, asset), '/static/' + asset) for asset in page_assets]
+    pairs += [(path, path) for path in JSON_PATHS]
+
+    browser = {'Accept-Encoding': 'br, gzip'}
+    print(f"{'resource':45} {'before':>10} {'after':>10} {'encoding':>9} {'saved':>6}")
+    rows = []
+    for old_path, new_path in pairs:
+        _, old_size, _ = fetch_bytes(client, old_path, {})
+        status, new_size, encoding = fetch_bytes(client, new_path, browser)
+        saved = 1 - new_size / old_size if old_size else 0.0
+        print(f"{new_path[:45]:45} {old_size:>10} {new_size:>10} {encoding:>9} {saved:>6.0%}")
+        rows.append({'before_path': old_path, 'after_path': new_path, 'status': status,
+                     'before_bytes': old_size, 'after_bytes': new_size, 'encoding': encoding})
+    total_before = sum(row['before_bytes'] for row in rows)
+    total_after = sum(row['after_bytes'] for row in rows)
+    print(f"{'total':45} {total_before:>10} {total_after:>10} {'':>9} {1 - total_after / total_before:>6.0%}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'resources': rows, 'total_before_bytes': total_before, 'total_after_bytes': total_after}, f, indent=2)
+        print(f"Wrote {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Worker scaling benchmark.
+
+Seeds a throwaway database, then for each worker count starts gunicorn in its
+directory (the same command as the Dockerfile), runs bench/run.py against it over
+HTTP and checks that a product added through one request is visible to every
+worker straight away (the shared catalog version invalidates their caches).
+Prints throughput and p95 per scenario and worker count as JSON.
+
+    python bench/worker_scaling.py --workers 1,2,4 --products 20000 --duration 5
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'bench'))
+
+from seed import seed
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/api/products?limit=1', timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not start within {timeout}s')
+
+def start_server(workdir, workers, threads, port):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, WEB_CONCURRENCY=str(workers),
+               IMPORT_JOB_DIR=os.path.join(workdir, 'jobs'), ADMISSION_CONTROL='off')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--threads', str(threads),
+         '--timeout', '30', 'app:create_app()'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def check_coherence(url, reads):
+    # Warm every worker's catalog cache first, then add a product and make sure no
+    # read (whichever worker it lands on) still serves the old catalog page.
+    for _ in range(reads):
+        urllib.request.urlopen(url + '/api/products?limit=5').read()
+    name = f'Coherence check {time.time_ns()}'
+    body = json.dumps({'name': name, 'price': 1, 'stock_quantity': 1}).encode()
+    request = urllib.request.Request(url + '/api/products', data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    urllib.request.urlopen(request).read()
+    stale = 0
+    for _ in range(reads):
+        with urllib.request.urlopen(url + '/api/products/autocomplete?q=' + urllib.parse.quote(name)) as r:
+            if not json.load(r)['suggestions']:
+                stale += 1
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=8, help='threads per worker')
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--scenarios', default='list,get,search')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='worker-scaling-')
+    seed(os.path.join(workdir, 'store.db'), args.products)
+    results = {}
+    for workers in [int(count) for count in args.workers.split(',')]:
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = start_server(workdir, workers, args.threads, port)
+        try:
+            wait_until_ready(url)
+            output = os.path.join(workdir, f'run-{workers}.json')
+            subprocess.run([sys.executable, os.path.join(REPO_ROOT, 'bench', 'run.py'), '--url', url,
+                            '--server-pid', str(server.pid), '--scenarios', args.scenarios,
+                            '--concurrency', str(args.concurrency), '--duration', str(args.duration),
+                            '--output', output], check=True, stdout=subprocess.DEVNULL)
+            with open(output) as f:
+                scenarios = json.load(f)['scenarios']
+            results[workers] = {
+                'scenarios': {name: {'throughput_rps': result['throughput_rps'],
+                                     'p95_ms': result['latency_ms']['p95'],
+                                     'errors': result['errors']}
+                              for name, result in scenarios.items()},
+                'peak_rss_mb': max((result['peak_rss_mb'] or 0) for result in scenarios.values()),
+                'stale_reads_after_write': check_coherence(url, reads=workers * args.threads * 4),
+            }
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    print(json.dumps({
+        'products': args.products,
+        'threads_per_worker': args.threads,
+        'concurrency': args.concurrency,
+        'cpus': os.cpu_count(),
+        'workers': results,
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Fingerprint and precompress the files in static/.
+
+    python build_assets.py            # writes static/dist/ and static/dist/manifest.json
+    python build_assets.py --clean    # removes static/dist/
+
+Each file is copied to static/dist/ with a content hash in its name
+(style.css -> dist/style.1a2b3c4d5e.css) next to .gz and, if the optional brotli
+package is installed, .br versions. The app reads the manifest at startup:
+url_for('static', filename='style.css') then links the hashed copy, which is
+served with a year-long immutable Cache-Control and the best precompressed
+variant the browser accepts. Re-run after editing anything in static/; without a
+manifest the original files are served as before.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from compression import brotli, compress
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR_NAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Only text formats are worth precompressing; images and fonts are compressed already.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+def source_files(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if d != DIST_DIR_NAME)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+def fingerprinted_name(relative_path, content):
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    stem, extension = os.path.splitext(relative_path)
+    return f"{stem}.{digest}{extension}"
+
+def build(static_dir=STATIC_DIR):
+    dist_dir = os.path.join(static_dir, DIST_DIR_NAME)
+    # Build into a fresh directory and swap it in, so a running app never sees a
+    # manifest pointing at files that are not written yet.
+    staging_dir = dist_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = {}
+    original_bytes = compressed_bytes = 0
+    for relative_path, path in source_files(static_dir):
+        with open(path, 'rb') as f:
+            content = f.read()
+        hashed = fingerprinted_name(relative_path, content)
+        target = os.path.join(staging_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if relative_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            variants = {'.gz': compress(content, 'gzip', level=9)}
+            if brotli is not None:
+                variants['.br'] = compress(content, 'br', level=11)
+            for suffix, data in variants.items():
+                with open(target + suffix, 'wb') as f:
+                    f.write(data)
+            original_bytes += len(content)
+            compressed_bytes += min(len(data) for data in variants.values())
+        manifest[relative_path] = f"{DIST_DIR_NAME}/{hashed}"
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.rename(staging_dir, dist_dir)
+    return manifest, original_bytes, compressed_bytes
+
+def load_manifest(static_dir=STATIC_DIR):
+    """{'style.css': 'dist/style.<hash>.css', ...}, or {} if assets were not built."""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR_NAME, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable asset manifest: {e}")
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clean', action='store_true', help='remove the built assets instead')
+    args = parser.parse_args()
+    if args.clean:
+        shutil.rmtree(os.path.join(STATIC_DIR, DIST_DIR_NAME), ignore_errors=True)
+        print("Removed built assets.")
+        return
+    manifest, original_bytes, compressed_bytes = build()
+    for source, hashed in sorted(manifest.items()):
+        print(f"  {source} -> {hashed}")
+    encodings = 'gzip and brotli' if brotli is not None else 'gzip (install brotli for .br files)'
+    print(f"Built {len(manifest)} asset(s), precompressed with {encodings}: "
+          f"{original_bytes} -> {compressed_bytes} bytes.")
+
+if __name__ == '__main__':
+    main()
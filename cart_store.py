@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from db_pool import run_immediate_transaction
+
+class CartStore(ABC):
+    """Server-side cart storage keyed by a short cart id kept in the session cookie.
+
+    A cart is just {product_id: quantity}; product details are joined in when the cart
+    is read, so the cookie stays the same small size however big the cart gets.
+    """
+
+    @abstractmethod
+    def get(self, cart_id):
+        """Return the cart as {product_id: quantity} (empty if there is none)."""
+
+    @abstractmethod
+    def add(self, cart_id, product_id, quantity):
+        """Add quantity to the product's line, creating it if needed."""
+
+    @abstractmethod
+    def set(self, cart_id, product_id, quantity):
+        """Set the product's quantity; a quantity of 0 or less removes the item."""
+
+    @abstractmethod
+    def remove(self, cart_id, product_id):
+        """Remove the product from the cart."""
+
+    @abstractmethod
+    def clear(self, cart_id):
+        """Empty the cart."""
+
+    @abstractmethod
+    def apply(self, cart_id, change):
+        """Read, change and write the cart as one unit, returning change's result.
+
+        change(quantities) edits the {product_id: quantity} dict in place. If it raises,
+        the cart is left as it was; no other write to the cart can interleave.
+        """
+
+class MemoryCartStore(CartStore):
+    """Per-process carts; fine for development and single-worker deployments."""
+
+    def __init__(self):
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def get(self, cart_id):
+        with self._lock:
+            return dict(self._carts.get(cart_id, {}))
+
+    def add(self, cart_id, product_id, quantity):
+        with self._lock:
+            cart = self._carts.setdefault(cart_id, {})
+            cart[product_id] = cart.get(product_id, 0) + quantity
+
+    def set(self, cart_id, product_id, quantity):
+        with self._lock:
+            cart = self._carts.setdefault(cart_id, {})
+            if quantity <= 0:
+                cart.pop(product_id, None)
+            else:
+                cart[product_id] = quantity
+
+    def remove(self, cart_id, product_id):
+        with self._lock:
+            self._carts.get(cart_id, {}).pop(product_id, None)
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def apply(self, cart_id, change):
+        with self._lock:
+            quantities = dict(self._carts.get(cart_id, {}))
+            result = change(quantities)
+            self._carts[cart_id] = quantities
+            return result
+
+class SQLiteCartStore(CartStore):
+    """Carts in the cart_items table, shared by every worker using the same store.db."""
+
+    # Roughly one write in PURGE_EVERY also deletes carts idle for longer than max_age.
+    PURGE_EVERY = 1000
+
+    def __init__(self, get_connection, max_age=7 * 24 * 3600):
+        self._get_connection = get_connection
+        self.max_age = max_age
+
+    def _write(self, sql, params):
+        conn = self._get_connection()
+        conn.execute(sql, params)
+        if random.randrange(self.PURGE_EVERY) == 0:
+            conn.execute("""DELETE FROM cart_items WHERE cart_id IN (
+                                SELECT cart_id FROM cart_items GROUP BY cart_id HAVING MAX(updated_at) < ?)""",
+                         (time.time() - self.max_age,))
+        conn.commit()
+
+    def get(self, cart_id):
+        conn = self._get_connection()
+        rows = conn.execute("SELECT product_id, quantity FROM cart_items WHERE cart_id = ?", (cart_id,)).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def add(self, cart_id, product_id, quantity):
+        self._write("""INSERT INTO cart_items (cart_id, product_id, quantity, updated_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(cart_id, product_id) DO UPDATE SET
+                           quantity = quantity + excluded.quantity, updated_at = excluded.updated_at""",
+                    (cart_id, product_id, quantity, time.time()))
+
+    def set(self, cart_id, product_id, quantity):
+        if quantity <= 0:
+            self.remove(cart_id, product_id)
+            return
+        self._write("""INSERT INTO cart_items (cart_id, product_id, quantity, updated_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(cart_id, product_id) DO UPDATE SET
+                           quantity = excluded.quantity, updated_at = excluded.updated_at""",
+                    (cart_id, product_id, quantity, time.time()))
+
+    def remove(self, cart_id, product_id):
+        self._write("DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?", (cart_id, product_id))
+
+    def clear(self, cart_id):
+        self._write("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
+
+    def apply(self, cart_id, change):
+        def work(conn):
+            # BEGIN IMMEDIATE is taken before the read, so a concurrent add or batch for
+            # the same cart waits instead of being overwritten.
+            rows = conn.execute("SELECT product_id, quantity FROM cart_items WHERE cart_id = ?", (cart_id,)).fetchall()
+            quantities = {row[0]: row[1] for row in rows}
+            result = change(quantities)
+            now = time.time()
+            conn.execute("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
+            conn.executemany("INSERT INTO cart_items (cart_id, product_id, quantity, updated_at) VALUES (?, ?, ?, ?)",
+                             [(cart_id, product_id, quantity, now) for product_id, quantity in quantities.items()])
+            return result
+        return run_immediate_transaction(self._get_connection(), work)
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'variants')
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        # Content-Encoding -> compressed body, filled in lazily by the app. Not counted
+        # against max_bytes; compressed JSON is a fraction of the body it came from.
+        self.variants = {}
+
+class CatalogCache:
+    """Bounded LRU of encoded catalog responses, keyed on a catalog version.
+
+    Every catalog write bumps the version (after its commit), which drops all entries.
+    A reader records the version *before* querying and passes it to put(); if a write
+    landed in the meantime the result is not stored, so stale rows can never be cached
+    under the new version.
+
+    With a version_source (a CatalogVersion), the version is the one shared through the
+    database and is checked on every get()/put(), so writes made by other processes
+    invalidate this one's entries too; bump() then only re-checks it. A source returning
+    None (version unknown) disables the cache until it recovers.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, version_source=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._version_source = version_source
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _sync(self):
+        # Called with the lock held; drops every entry once the shared version moves.
+        if self._version_source is not None:
+            version = self._version_source()
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+                self._bytes = 0
+        return self._version
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._sync()
+
+    def bump(self):
+        with self._lock:
+            if self._version_source is not None:
+                return self._sync()
+            self._version += 1
+            self._entries.clear()
+            self._bytes = 0
+            return self._version
+
+    def get(self, key):
+        with self._lock:
+            if self._sync() is None:
+                self._misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key, body, version):
+        """Store an encoded body read at `version`; returns its CacheEntry either way."""
+        entry = CacheEntry(body, hashlib.blake2b(body, digest_size=16).hexdigest())
+        size = len(body)
+        if size > self.max_bytes:
+            return entry
+        with self._lock:
+            if version is None or version != self._sync():
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self._evictions += 1
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits_total': self._hits,
+                'misses_total': self._misses,
+                'evictions_total': self._evictions,
+            }
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+
+# One row, bumped by triggers in the same transaction as any change to products, so
+# every process sharing store.db (and any tool writing to it) moves it forward.
+CATALOG_VERSION_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS catalog_version (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           version INTEGER NOT NULL
+       )""",
+    "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS products_catalog_version_{event.lower()} AFTER {event} ON products
+        BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END"""
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+# A second counter that only moves when the set of product names changes, for the
+# autocomplete index: stock and price updates (every checkout) leave it alone.
+NAMES_VERSION_SCHEMA = (
+    "ALTER TABLE catalog_version ADD COLUMN names_version INTEGER NOT NULL DEFAULT 0",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS products_names_version_{name} AFTER {event} ON products
+        {when}
+        BEGIN
+            UPDATE catalog_version SET names_version = names_version + 1 WHERE id = 1;
+        END"""
+    for name, event, when in (('insert', 'INSERT', ''), ('delete', 'DELETE', ''),
+                              ('rename', 'UPDATE OF name', 'WHEN old.name IS NOT new.name'))
+)
+
+def create_catalog_version(conn):
+    for sql in CATALOG_VERSION_SCHEMA:
+        conn.execute(sql)
+    print(f"Table 'catalog_version' and its triggers configured.")
+
+def add_names_version(conn):
+    for sql in NAMES_VERSION_SCHEMA:
+        conn.execute(sql)
+    print(f"Column 'catalog_version.names_version' and its triggers configured.")
+
+class CatalogVersion:
+    """Reads the shared catalog version, touching the table only after a commit.
+
+    PRAGMA data_version on a connection changes whenever another connection (in any
+    process) has committed to the database since it was last asked. It is answered
+    from the WAL index in shared memory, so while nothing is written a check costs
+    microseconds; only after some commit is the version row read again.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._conn = None
+        self._pid = None
+        self._data_version = None
+        self._versions = None # (version, names_version)
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def _connection(self):
+        # Opened lazily and again in a forked worker: a SQLite connection must not be
+        # used across fork(), so the parent's is left alone rather than closed.
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+            self._data_version = None
+        return self._conn
+
+    def current(self):
+        """(version, names_version): any product change, and changes to the set of names."""
+        with self._lock:
+            conn = self._connection()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                row = conn.execute("SELECT version, names_version FROM catalog_version WHERE id = 1").fetchone()
+                # Read the row before remembering data_version, so a failed read is retried.
+                self._versions = tuple(row) if row else (0, 0)
+                self._data_version = data_version
+                self.reads += 1
+            return self._versions
+
+    def __call__(self):
+        versions = self._read()
+        return versions[0] if versions is not None else None
+
+    def names(self):
+        """The names-only version, for indexes of product names (see NAMES_VERSION_SCHEMA)."""
+        versions = self._read()
+        return versions[1] if versions is not None else None
+
+    def _read(self):
+        try:
+            return self.current()
+        except sqlite3.Error as e:
+            # Without the table (older database) or on a transient error the version is
+            # unknown (None): callers then neither serve nor store cached catalog data.
+            print(f"Could not read the catalog version: {e}")
+            with self._lock:
+                self._conn = None
+            return None
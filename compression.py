@@ -0,0 +1,31 @@
+import gzip
+
+try:
+    import brotli # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Below this a compressed body saves too little to be worth the CPU (and fits in
+# one TCP segment either way).
+COMPRESS_MIN_BYTES = 1024
+# Responses are compressed per request (or once per catalog cache entry), so favour
+# speed; build_assets.py uses the maximum levels for static files instead.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def available_encodings():
+    """Content-Encodings this process can produce, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding(accept_encodings):
+    """Pick the preferred encoding the client accepts (a werkzeug Accept), or None."""
+    for encoding in available_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+def compress(body, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 so identical bodies compress to identical bytes.
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
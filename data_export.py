@@ -0,0 +1,100 @@
+"""Streaming exports of products and orders to CSV or XLSX.
+
+Rows are read in keyset-paginated batches, each on a briefly borrowed pooled
+connection, so a long download neither pins a connection nor holds one read
+transaction open for its whole duration. Rows are bounded by the highest id seen
+when the export starts; rows written while it runs may or may not be included.
+"""
+import csv
+import io
+import tempfile
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_BATCH_SIZE = 2000
+# Bytes handed to the server at a time when streaming a finished XLSX file.
+EXPORT_FILE_CHUNK_SIZE = 64 * 1024
+
+# Same headers, in the same order, as product_import.IMPORT_COLUMNS, so an export can
+# be edited and uploaded again as-is.
+PRODUCT_EXPORT_HEADERS = ('Name', 'Price', 'Stock Quantity', 'Description', 'Image URL')
+PRODUCT_EXPORT_SQL = """SELECT id, name, price, stock_quantity, description, image_url FROM products
+                        WHERE id > ? AND id <= ? ORDER BY id LIMIT ?"""
+PRODUCT_EXPORT_MAX_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM products"
+
+# One row per order line; the order columns repeat on each of its lines.
+ORDER_EXPORT_HEADERS = ('Order ID', 'Created At', 'Customer Name', 'Customer Email', 'Order Total',
+                        'Product ID', 'Product Name', 'Quantity', 'Price Per Item')
+ORDER_EXPORT_SQL = """SELECT oi.id, o.id, o.created_at, o.customer_name, o.customer_email, o.total_amount,
+                             oi.product_id, p.name, oi.quantity, oi.price_per_item
+                      FROM order_items oi
+                      JOIN orders o ON o.id = oi.order_id
+                      LEFT JOIN products p ON p.id = oi.product_id
+                      WHERE oi.id > ? AND oi.id <= ? ORDER BY oi.id LIMIT ?"""
+ORDER_EXPORT_MAX_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM order_items"
+
+EXPORTS = {
+    'products': (PRODUCT_EXPORT_HEADERS, PRODUCT_EXPORT_SQL, PRODUCT_EXPORT_MAX_ID_SQL),
+    'orders': (ORDER_EXPORT_HEADERS, ORDER_EXPORT_SQL, ORDER_EXPORT_MAX_ID_SQL),
+}
+
+def iter_row_batches(connect, sql, max_id_sql, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of rows; the first column of sql is the keyset id and is dropped."""
+    conn = connect()
+    try:
+        max_id = conn.execute(max_id_sql).fetchone()[0]
+    finally:
+        conn.close()
+    last_id = 0
+    while last_id < max_id:
+        conn = connect()
+        try:
+            rows = conn.execute(sql, (last_id, max_id, batch_size)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [tuple(row)[1:] for row in rows]
+
+def csv_chunks(headers, row_batches):
+    """Encode each batch of rows as one UTF-8 CSV chunk, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for rows in row_batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8') # Header of an empty export
+
+def xlsx_chunks(headers, row_batches, sheet_title):
+    """Build a write-only workbook and yield it in fixed-size chunks.
+
+    openpyxl's write-only mode streams appended rows to a temporary file instead of
+    keeping cells in memory, but an XLSX is a zip archive that is only complete once
+    saved, so bytes start flowing after the last row has been read.
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(headers)
+    for rows in row_batches:
+        for row in rows:
+            sheet.append(row)
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(EXPORT_FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def export_chunks(connect, dataset, file_format, batch_size=EXPORT_BATCH_SIZE):
+    headers, sql, max_id_sql = EXPORTS[dataset]
+    row_batches = iter_row_batches(connect, sql, max_id_sql, batch_size)
+    if file_format == 'xlsx':
+        return xlsx_chunks(headers, row_batches, sheet_title=dataset.capitalize())
+    return csv_chunks(headers, row_batches)
@@ -11,13 +11,51 @@ def create_connection():
     return conn
 
 def create_table(conn, create_table_sql):
-    try:
-        c = conn.cursor()
-        c.execute(create_table_sql)
-    except sqlite3.Error as e:
-        print(e)
+    # Errors propagate: this runs inside a migration step, which must roll back (and not
+    # record its version) rather than leave the schema half built.
+    c = conn.cursor()
+    c.execute(create_table_sql)
 
-def setup_database():
+def setup_product_search_index(conn):
+    # FTS5 index over products.name/description. It is an external-content table, so the
+    # text lives only in 'products'; the triggers below keep the index in sync for every
+    # write path (API add/update/delete and the Excel import alike).
+    fts_existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='products_fts';").fetchone() is not None
+
+    sql_create_products_fts_table = """ CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                                            name,
+                                            description,
+                                            content='products',
+                                            content_rowid='id'
+                                        ); """
+    create_table(conn, sql_create_products_fts_table)
+
+    sql_create_fts_triggers = [
+        """ CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END; """,
+        """ CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            END; """,
+        # Only re-index when the searchable text actually changes, not on price/stock updates
+        # or on import upserts that rewrite the same name/description.
+        """ CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products
+            WHEN old.name IS NOT new.name OR old.description IS NOT new.description BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END; """,
+    ]
+    for sql in sql_create_fts_triggers:
+        create_table(conn, sql)
+
+    if not fts_existed:
+        # Backfill the index for databases that already contain products.
+        conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild');")
+    print(f"Search index 'products_fts' configured.")
+
+def create_base_schema(conn):
+    # Schema version 1: the original tables plus search, carts and unique product names.
     sql_create_products_table = """ CREATE TABLE IF NOT EXISTS products (
                                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                                         name TEXT NOT NULL,
@@ -26,39 +64,107 @@ def setup_database():
                                         image_url TEXT,
                                         stock_quantity INTEGER NOT NULL DEFAULT 0
                                     ); """
+    create_table(conn, sql_create_products_table)
+    print(f"Table 'products' configured.")
+
+    sql_create_orders_table = """ CREATE TABLE IF NOT EXISTS orders (
+                                      id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                      customer_name TEXT NOT NULL,
+                                      customer_email TEXT NOT NULL,
+                                      total_amount REAL NOT NULL,
+                                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                                  ); """
+    create_table(conn, sql_create_orders_table)
+    print(f"Table 'orders' configured.")
+
+    sql_create_order_items_table = """ CREATE TABLE IF NOT EXISTS order_items (
+                                           id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                           order_id INTEGER NOT NULL,
+                                           product_id INTEGER NOT NULL,
+                                           quantity INTEGER NOT NULL,
+                                           price_per_item REAL NOT NULL,
+                                           FOREIGN KEY (order_id) REFERENCES orders (id),
+                                           FOREIGN KEY (product_id) REFERENCES products (id) 
+                                       ); """
+    create_table(conn, sql_create_order_items_table)
+    print(f"Table 'order_items' configured.")
+
+    # Server-side carts: the session cookie only carries the cart_id.
+    sql_create_cart_items_table = """ CREATE TABLE IF NOT EXISTS cart_items (
+                                          cart_id TEXT NOT NULL,
+                                          product_id INTEGER NOT NULL,
+                                          quantity INTEGER NOT NULL,
+                                          updated_at REAL NOT NULL,
+                                          PRIMARY KEY (cart_id, product_id)
+                                      ) WITHOUT ROWID; """
+    create_table(conn, sql_create_cart_items_table)
+    create_table(conn, "CREATE INDEX IF NOT EXISTS idx_cart_items_updated_at ON cart_items (updated_at);")
+    print(f"Table 'cart_items' configured.")
+
+    # Unique product names: the Excel import upserts with ON CONFLICT(name). Without the
+    # index every import would fail, so duplicates stop the migration instead.
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_products_name ON products (name);")
+    except sqlite3.IntegrityError as e:
+        duplicates = [row[0] for row in conn.execute(
+            "SELECT name FROM products GROUP BY name HAVING COUNT(*) > 1 LIMIT 10")]
+        raise sqlite3.IntegrityError(
+            f"Cannot create the unique index on products.name ({e}). Remove or rename the products "
+            f"with duplicate names, then start the app again. Duplicates include: {', '.join(map(repr, duplicates))}"
+        ) from e
+    print(f"Index 'idx_products_name' configured.")
+
+    setup_product_search_index(conn)
+
+def create_sales_rollup_tables(conn):
+    # Sales rollups, maintained by checkout in the order's own transaction (see sales_rollups.py).
+    sql_create_rollup_tables = [
+        """ CREATE TABLE IF NOT EXISTS sales_daily (
+                day TEXT PRIMARY KEY,
+                orders INTEGER NOT NULL DEFAULT 0,
+                units INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0
+            ) WITHOUT ROWID; """,
+        """ CREATE TABLE IF NOT EXISTS sales_daily_product (
+                day TEXT NOT NULL,
+                product_id INTEGER NOT NULL,
+                units INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, product_id)
+            ) WITHOUT ROWID; """,
+        "CREATE INDEX IF NOT EXISTS idx_sales_daily_product_product ON sales_daily_product (product_id, day);",
+        """ CREATE TABLE IF NOT EXISTS product_sales_totals (
+                product_id INTEGER PRIMARY KEY,
+                units INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0
+            ); """,
+        "CREATE INDEX IF NOT EXISTS idx_product_sales_totals_revenue ON product_sales_totals (revenue);",
+        "CREATE INDEX IF NOT EXISTS idx_product_sales_totals_units ON product_sales_totals (units);",
+    ]
+    for sql in sql_create_rollup_tables:
+        conn.execute(sql)
+    print(f"Sales rollup tables configured.")
+
+def setup_database():
+    # Brings the database up to the latest schema version (see migrations.py).
+    # Returns True if any migration was applied, False if it was already current;
+    # the already-current case only reads PRAGMA user_version, so it is cheap to run
+    # on every start.
+    from migrations import migrate
 
     conn = create_connection()
 
     if conn is not None:
-        create_table(conn, sql_create_products_table)
-        print(f"Table 'products' configured.")
-
-        sql_create_orders_table = """ CREATE TABLE IF NOT EXISTS orders (
-                                          id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                          customer_name TEXT NOT NULL,
-                                          customer_email TEXT NOT NULL,
-                                          total_amount REAL NOT NULL,
-                                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                                      ); """
-        create_table(conn, sql_create_orders_table)
-        print(f"Table 'orders' configured.")
-
-        sql_create_order_items_table = """ CREATE TABLE IF NOT EXISTS order_items (
-                                               id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                               order_id INTEGER NOT NULL,
-                                               product_id INTEGER NOT NULL,
-                                               quantity INTEGER NOT NULL,
-                                               price_per_item REAL NOT NULL,
-                                               FOREIGN KEY (order_id) REFERENCES orders (id),
-                                               FOREIGN KEY (product_id) REFERENCES products (id) 
-                                           ); """
-        create_table(conn, sql_create_order_items_table)
-        print(f"Table 'order_items' configured.")
-        
-        print(f"Database {DATABASE_NAME} all tables configured.")
-        conn.close()
+        try:
+            applied = migrate(conn)
+        finally:
+            conn.close()
+        if applied:
+            print(f"Database {DATABASE_NAME} all tables configured.")
+        return bool(applied)
     else:
         print("Error! cannot create the database connection.")
+        return False
 
 if __name__ == '__main__':
     setup_database()
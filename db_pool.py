@@ -0,0 +1,290 @@
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+# Applied once to every new connection. journal_mode=WAL is persistent in the database
+# file; the others are per-connection settings.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),          # readers no longer block the writer (and vice versa)
+    ('synchronous', 'NORMAL'),        # safe with WAL, avoids an fsync on every commit
+    ('mmap_size', 256 * 1024 * 1024), # read pages through the OS page cache
+    ('cache_size', -20000),           # negative = KiB, so ~20 MB page cache per connection
+    ('busy_timeout', 5000),           # wait up to 5s for the write lock instead of failing
+    ('temp_store', 'MEMORY'),
+)
+
+# Values per chunked "IN (?, ?, ...)" lookup: well below SQLite's host parameter limit
+# (999 on older builds).
+LOOKUP_CHUNK_SIZE = 500
+
+class DatabaseBusy(Exception):
+    """The database could not take the work in time; the app answers 503 with Retry-After.
+
+    Deliberately not a sqlite3.Error, so handlers that turn database errors into a 500
+    let it through. reason labels the rejection in metrics.
+    """
+    reason = 'busy'
+
+class PoolTimeout(DatabaseBusy):
+    """Raised when no pooled connection became free within the pool timeout."""
+    reason = 'pool_timeout'
+
+class TimedCursor:
+    """Cursor proxy that reports each execute()/executemany() to on_query(sql, seconds)."""
+
+    def __init__(self, cursor, on_query):
+        self._cursor = cursor
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, parameters)
+            return self
+        finally:
+            self._on_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_parameters)
+            return self
+        finally:
+            self._on_query(sql, time.perf_counter() - started)
+
+class InstrumentedConnection:
+    """Proxy around a sqlite3.Connection that times statements and commits.
+
+    With on_query=None it is a plain pass-through. Only execute/executemany/commit
+    and cursor() are intercepted; the time to step through a SELECT's remaining rows
+    (fetchall) is not included, only the time to prepare it and produce the first row.
+    """
+
+    def __init__(self, conn, on_query=None):
+        self._conn = conn
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        return TimedCursor(cursor, self._on_query) if self._on_query else cursor
+
+    def execute(self, sql, parameters=()):
+        if not self._on_query:
+            return self._conn.execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not self._on_query:
+            return self._conn.executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not self._on_query:
+            return self._conn.commit()
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._on_query('COMMIT', time.perf_counter() - started)
+
+class PooledConnection(InstrumentedConnection):
+    """Proxy around a sqlite3.Connection whose close() returns it to the pool.
+
+    Everything else is delegated, so existing code that calls conn.execute(),
+    conn.commit() and conn.close() works unchanged.
+    """
+
+    def __init__(self, pool, conn):
+        super().__init__(conn, pool.on_query)
+        self._pool = pool
+        self.released = False
+
+    def close(self):
+        # Safe to call more than once (endpoints close by hand and teardown closes again).
+        if not self.released:
+            self.released = True
+            self._pool.release(self._conn)
+
+class ConnectionPool:
+    """A bounded pool of pre-configured SQLite connections shared by all threads."""
+
+    def __init__(self, database, max_size=8, timeout=30.0, pragmas=DEFAULT_PRAGMAS, on_query=None, on_wait=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        # Optional instrumentation hooks: on_query(sql, seconds) for every statement run
+        # through a pooled connection, on_wait(seconds) for every acquire().
+        self.on_query = on_query
+        self.on_wait = on_wait
+        self._idle = queue.LifoQueue() # LIFO keeps the warmest connections in use
+        self._lock = threading.Lock()
+        self._created = 0
+        self._acquired = 0
+        self._reused = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._in_use = 0
+        # A SQLite connection must not be used across fork() (e.g. gunicorn --preload):
+        # a forked worker starts with an empty pool. The parent's connections are
+        # abandoned, not closed, so the child can't disturb the parent's locks.
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+    def connect(self):
+        # A new connection configured like the pooled ones. Also used directly for
+        # long-lived dedicated connections (e.g. the write queue's writer thread).
+        # Connections move between request threads, but only one thread uses a
+        # connection at a time, so the same-thread check is not needed.
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                print(f"Could not apply PRAGMA {name}={value}: {e}")
+        return conn
+
+    def acquire(self):
+        conn = None
+        waited = 0.0
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            reused = False
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f'Timed out after {self.timeout}s waiting for a database connection')
+                finally:
+                    waited = time.perf_counter() - started
+                    with self._lock:
+                        self._waits += 1
+                        self._wait_time += waited
+                reused = True
+
+        with self._lock:
+            self._acquired += 1
+            self._in_use += 1
+            if reused:
+                self._reused += 1
+        if self.on_wait:
+            self.on_wait(waited)
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                # Never hand the next borrower a half-finished transaction.
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped rather than put back.
+            conn.close()
+            with self._lock:
+                self._created -= 1
+                self._in_use -= 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'database': self.database,
+                'max_size': self.max_size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'acquired_total': self._acquired,
+                'reused_total': self._reused,
+                'waits_total': self._waits,
+                'wait_seconds_total': round(self._wait_time, 6),
+                'timeouts_total': self._timeouts,
+            }
+
+def is_lock_contention(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def run_immediate_transaction(conn, work, retries=5, base_delay=0.02, max_delay=0.5):
+    """Run work(conn) inside BEGIN IMMEDIATE and commit; roll back if it raises.
+
+    BEGIN IMMEDIATE takes the write lock up front, so two writers can't both read
+    and then fail to upgrade. If the lock is still busy after busy_timeout, the whole
+    transaction is retried with bounded, jittered exponential backoff.
+    """
+    attempt = 0
+    while True:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            if not is_lock_contention(e) or attempt >= retries:
+                raise
+            attempt += 1
+            time.sleep(min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0))
+            continue
+        try:
+            result = work(conn)
+            conn.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if not is_lock_contention(e) or attempt >= retries:
+                raise
+            attempt += 1
+            time.sleep(min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0))
+        except BaseException:
+            conn.rollback()
+            raise
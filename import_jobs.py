@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+class ImportJob:
+    def __init__(self, filename, file_type, path, delete_missing=False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_type = file_type
+        self.path = path
+        self.delete_missing = delete_missing
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows_parsed = 0
+        self.rows_validated = 0
+        self.rows_staged = 0
+        self.rows_written = 0 # Set only once the import's write has committed
+        self.error_count = 0
+        self.result = None
+        self.error = None
+        self.details = []
+        self._lock = threading.Lock()
+
+    def update_progress(self, rows_parsed, rows_validated, rows_staged, error_count):
+        # rows_staged are new or changed rows waiting for the final write.
+        with self._lock:
+            self.rows_parsed = rows_parsed
+            self.rows_validated = rows_validated
+            self.rows_staged = rows_staged
+            self.error_count = error_count
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'filename': self.filename,
+                'delete_missing': self.delete_missing,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'rows_parsed': self.rows_parsed,
+                'rows_validated': self.rows_validated,
+                'rows_staged': self.rows_staged,
+                'rows_written': self.rows_written,
+                'error_count': self.error_count,
+            }
+            if self.result is not None:
+                data.update(self.result)
+            if self.error is not None:
+                data['error'] = self.error
+                data['details'] = self.details
+            return data
+
+class StoredImportJob:
+    """A job's last saved status, as read back from the state directory."""
+
+    def __init__(self, data):
+        self.id = data['job_id']
+        self.created_at = data.get('created_at', 0)
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class ImportJobManager:
+    """Runs product imports on a small background worker pool.
+
+    One worker is the sensible default: SQLite has a single write lock, so parallel
+    imports would only queue up behind each other inside the database.
+
+    With several app processes (gunicorn workers) a job runs in the process that
+    accepted the upload, but a status poll may reach any of them. With state_dir set,
+    every status change is also saved there as <job_id>.json, so get() and list() in
+    any process that shares the directory see every job.
+    """
+
+    JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, connect, max_workers=1, max_finished_jobs=100, on_commit=None, timings=None,
+                 state_dir=None):
+        # connect() returns a connection for one job; the job closes it when done.
+        self._connect = connect
+        self._on_commit = on_commit
+        self._timings = timings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='product-import')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_finished_jobs = max_finished_jobs
+        self._state_dir = state_dir
+
+    def submit(self, filename, file_type, path, delete_missing=False):
+        # path is a temporary copy of the upload; the job deletes it when done.
+        job = ImportJob(filename, file_type, path, delete_missing)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._save(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._state_dir and self.JOB_ID_PATTERN.match(job_id):
+            job = self._load(job_id + '.json')
+        return job
+
+    def list(self):
+        with self._lock:
+            jobs = {job.id: job for job in self._jobs.values()}
+        # Jobs of this process are freshest in memory; the others come from their files.
+        for name in self._state_files():
+            if name[:-len('.json')] not in jobs:
+                stored = self._load(name)
+                if stored is not None:
+                    jobs[stored.id] = stored
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _state_files(self):
+        if not self._state_dir:
+            return []
+        try:
+            return [name for name in os.listdir(self._state_dir)
+                    if name.endswith('.json') and self.JOB_ID_PATTERN.match(name[:-len('.json')])]
+        except FileNotFoundError:
+            return []
+
+    def _load(self, name):
+        try:
+            with open(os.path.join(self._state_dir, name)) as f:
+                return StoredImportJob(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, job):
+        if not self._state_dir:
+            return
+        try:
+            os.makedirs(self._state_dir, exist_ok=True)
+            # Write then rename, so readers in other processes never see a partial file.
+            fd, tmp_path = tempfile.mkstemp(dir=self._state_dir, prefix='.job-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, os.path.join(self._state_dir, job.id + '.json'))
+        except OSError as e:
+            print(f"Could not save status of import job {job.id}: {e}")
+
+    def _prune_state_files(self):
+        # Keep the newest max_finished_jobs files; running jobs rewrite theirs per chunk.
+        paths = [os.path.join(self._state_dir, name) for name in self._state_files()]
+        try:
+            paths.sort(key=os.path.getmtime, reverse=True)
+        except OSError:
+            return # Another process pruned at the same time
+        for path in paths[self._max_finished_jobs:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (JOB_SUCCEEDED, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - self._max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status, result=None, error=None, details=None):
+        with job._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.details = details or []
+            job.finished_at = time.time()
+        self._save(job)
+        if self._state_dir:
+            self._prune_state_files()
+
+    def _progress(self, job):
+        def report(rows_parsed, rows_validated, rows_staged, error_count):
+            job.update_progress(rows_parsed, rows_validated, rows_staged, error_count)
+            self._save(job)
+        return report
+
+    def _run(self, job):
+        # Imported here so pandas is only loaded once an import actually runs.
+        from product_import import ImportFileError, ImportRowErrors, import_product_chunks, read_product_chunks
+        with job._lock:
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+        self._save(job)
+        try:
+            conn = self._connect()
+            try:
+                with open(job.path, 'rb') as stream:
+                    result = import_product_chunks(conn, read_product_chunks(stream, job.file_type),
+                                                   progress=self._progress(job), timings=self._timings,
+                                                   delete_missing=job.delete_missing)
+            finally:
+                conn.close()
+            with job._lock:
+                job.rows_written = result['rows_written']
+            if self._on_commit and (result['added'] or result['updated'] or result['removed']):
+                self._on_commit()
+            self._finish(job, JOB_SUCCEEDED, result={
+                'message': 'Excel processed successfully.',
+                'added': result['added'],
+                'updated': result['updated'],
+                'unchanged': result['unchanged'],
+                'removed': result['removed'],
+                'rows': result['rows'],
+                'elapsed_seconds': result['elapsed_seconds'],
+                'rows_per_sec': result['rows_per_sec'],
+                'phase_seconds': result['phase_seconds'],
+            })
+        except ImportRowErrors as e:
+            # Same all-or-nothing rule as the synchronous upload: nothing was written.
+            self._finish(job, JOB_FAILED,
+                         error='Errors occurred during processing. No products were imported or updated due to issues in specific rows.',
+                         details=e.result['row_errors'])
+        except ImportFileError as e:
+            self._finish(job, JOB_FAILED, error=str(e))
+        except Exception as e:
+            print(f"Import job {job.id} failed: {e}")
+            self._finish(job, JOB_FAILED, error=f'An unexpected server error occurred: {str(e)}')
+        finally:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
@@ -0,0 +1,113 @@
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+# Latency buckets in seconds, from 0.1ms (a cached read) up to 10s (a big import).
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}')
+        return lines
+
+class Histogram:
+    """Prometheus-style cumulative histogram; observe() is a bisect plus a locked add."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        # Index of the first bucket whose upper bound is >= value (len(buckets) for +Inf).
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, [('le', _format_number(bound))])
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {series[-1]!r}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class Collector:
+    """Values read at scrape time from a callable returning {name: (help, value)}.
+
+    Names ending in _total are exposed as counters, everything else as gauges.
+    """
+
+    def __init__(self, collect):
+        self._collect = collect
+
+    def render(self):
+        lines = []
+        for name, (help_text, value) in self._collect().items():
+            if value is None:
+                continue
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {_format_number(value)}']
+        return lines
+
+def render(metrics):
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\?(\s*,\s*\?)+')
+
+@lru_cache(maxsize=1024)
+def statement_label(sql):
+    """A bounded-cardinality label for a SQL statement.
+
+    Whitespace is collapsed and variable-length placeholder lists such as
+    IN (?, ?, ?) become IN (?...), so one query shape is one time series.
+    """
+    sql = _PLACEHOLDER_LIST.sub('?...', _WHITESPACE.sub(' ', sql).strip())
+    return sql if len(sql) <= 160 else sql[:157] + '...'
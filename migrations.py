@@ -0,0 +1,218 @@
+"""Versioned schema migrations for store.db, tracked in PRAGMA user_version.
+
+    python migrations.py status        # current and latest version
+    python migrations.py migrate       # apply pending migrations in place
+    python migrations.py check-plans   # fail if a hot query does a full table scan
+
+Each migration runs in its own BEGIN IMMEDIATE transaction together with the
+user_version bump, so a failed step leaves the database at the previous version.
+To change the schema, append a new (version, description, function) entry.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from database_setup import DATABASE_NAME, create_base_schema, create_sales_rollup_tables
+from sales_rollups import backfill_rollups
+from catalog_version import add_names_version, create_catalog_version
+
+def add_sales_rollups(conn):
+    create_sales_rollup_tables(conn)
+    backfill_rollups(conn)
+
+def add_order_indexes(conn):
+    # Order lookups: the items of an order, and a customer's order history.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_customer_email ON orders (customer_email);")
+    print(f"Indexes on order_items.order_id and orders.customer_email configured.")
+
+def add_content_hash(conn):
+    # Written by product imports (product_import.content_hashes) to skip unchanged rows.
+    # Any other change to a hashed column clears the hash, so that row is rewritten by
+    # the next import; the WHEN clause keeps later changes (e.g. checkouts) to one UPDATE.
+    conn.execute("ALTER TABLE products ADD COLUMN content_hash INTEGER;")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_content_hash_stale
+                    AFTER UPDATE OF price, description, image_url, stock_quantity ON products
+                    WHEN new.content_hash IS NOT NULL AND new.content_hash IS old.content_hash
+                    BEGIN
+                        UPDATE products SET content_hash = NULL WHERE id = new.id;
+                    END;""")
+    print(f"Column 'products.content_hash' and its trigger configured.")
+
+MIGRATIONS = [
+    (1, 'Base tables, product search index and unique product names', create_base_schema),
+    (2, 'Sales rollup tables, backfilled from existing orders', add_sales_rollups),
+    (3, 'Indexes on order_items.order_id and orders.customer_email', add_order_indexes),
+    (4, 'Catalog version row, bumped by triggers on products, for cross-process caches', create_catalog_version),
+    (5, 'Content hash on products, so re-imports skip unchanged rows', add_content_hash),
+    (6, 'Names-only catalog version, so stock and price changes keep the autocomplete index', add_names_version),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply pending migrations up to target; returns the versions applied."""
+    if schema_version(conn) >= target:
+        return []
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked again under the write lock: another process starting at the same
+            # time may have applied this step while we waited.
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version};")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+# --- Query plan checks ---
+
+# Statements that may legitimately scan a whole table, with the reason.
+ALLOWED_SCANS = {
+    "SELECT id, name, description, price, image_url, stock_quantity FROM products WHERE name LIKE":
+        'mode=substring search is the explicit unindexed fallback',
+    "INSERT INTO products (name, description, price, image_url, stock_quantity, content_hash) SELECT":
+        'an import applies every row it staged, and only those',
+    "DELETE FROM products WHERE name NOT IN (SELECT name FROM temp.import_names)":
+        'an import with delete_missing checks every product against the names in the file',
+    "SELECT id, name FROM products": 'the autocomplete index is (re)built from every product name, off the request path',
+    "SELECT day, orders, units, revenue FROM sales_daily WHERE 1 ": 'an unbounded daily report returns every row (one per day)',
+    "DELETE FROM cart_items WHERE cart_id IN ( SELECT cart_id FROM cart_items GROUP BY cart_id HAVING":
+        'the occasional (1 in PURGE_EVERY writes) stale-cart purge sweeps every cart by design',
+}
+
+# Steps in plans that are not a table scan even though they start with SCAN.
+NON_TABLE_SCAN = re.compile(r'^SCAN (lines|(\d+ )?CONSTANT ROWS?|\w+ VIRTUAL TABLE|.* USING (COVERING )?INDEX)')
+
+def _plan_scans(conn, sql):
+    params = [None] * sql.count('?')
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [detail for _, _, _, detail in rows
+            if detail.startswith('SCAN ') and not NON_TABLE_SCAN.match(detail)]
+
+def _exercise_app(client):
+    # One pass over the endpoints, with enough data for every code path to run a query.
+    import io
+    client.post('/api/products', json={'name': 'Diamond Sword', 'price': 10, 'stock_quantity': 50,
+                                       'description': 'sharp blade'})
+    client.post('/api/products', json={'name': 'Iron Pickaxe', 'price': 5, 'stock_quantity': 50})
+    client.put('/api/products/2', json={'name': 'Iron Pickaxe', 'price': 6, 'stock_quantity': 40})
+    client.get('/api/products')
+    client.get('/api/products?cursor=1&limit=1')
+    client.get('/api/products?stream=ndjson')
+    client.get('/api/products/1')
+    client.get('/api/products/search?q=diamond')
+    client.get('/api/products/search?q=dia&mode=substring')
+    client.get('/api/products/autocomplete?q=dia')
+    csv = b'Name,Price,Stock Quantity\nDiamond Sword,11,60\nGolden Apple,3,20\n'
+    client.post('/api/upload_products_excel', data={'excel_file': (io.BytesIO(csv), 'products.csv')})
+    client.post('/api/cart/add', json={'product_id': 1, 'quantity': 2})
+    client.post('/api/cart/add', json={'product_id': 2, 'quantity': 1})
+    client.put('/api/cart/update/2', json={'quantity': 3})
+    client.get('/api/cart')
+    client.get('/api/cart/count')
+    client.get('/')
+    client.get('/cart')
+    client.post('/api/cart/batch', json={'operations': [{'op': 'add', 'product_id': 3, 'quantity': 1},
+                                                        {'op': 'remove', 'product_id': 3}]})
+    client.post('/api/checkout/place_order', json={'customer_name': 'Steve', 'customer_email': 'steve@example.com'})
+    client.post('/api/cart/add', json={'product_id': 1, 'quantity': 1000})
+    client.post('/api/checkout/place_order', json={'customer_name': 'Alex', 'customer_email': 'alex@example.com'})
+    client.delete('/api/cart/remove/1')
+    client.post('/api/cart/clear')
+    client.get('/api/reports/sales/daily')
+    client.get('/api/reports/sales/daily?from=2000-01-01&to=2999-12-31')
+    client.get('/api/reports/sales/products/1')
+    client.get('/api/reports/top_sellers')
+    client.get('/api/reports/top_sellers?by=units&from=2000-01-01')
+    client.post('/api/products/bulk', json={'products': [{'name': 'Bulk Torch', 'price': 1}, {'name': 'Bulk Rail', 'price': 2}]})
+    client.patch('/api/products/bulk', json={'products': [{'id': 1, 'price': 12}, {'id': 3, 'name': 'Golden Carrot'}]})
+    client.delete('/api/products/bulk', json={'ids': [4, 5, 999]})
+    for url in ('/api/export/products', '/api/export/products?format=xlsx', '/api/export/orders'):
+        response = client.get(url, headers={'X-Admin-Token': 'plan-check'})
+        response.get_data()
+        response.close() # Frees the export slot
+    client.delete('/api/products/2')
+    client.post('/api/upload_products_excel', data={'excel_file': (io.BytesIO(csv), 'products.csv'), 'delete_missing': '1'})
+
+def check_query_plans():
+    """Run the app against a scratch database, capture every statement it issues and
+    EXPLAIN QUERY PLAN each one. Returns a list of (statement, scans) violations."""
+    os.chdir(tempfile.mkdtemp(prefix='plan-check-'))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # The pass below is one fast client; rate limits would turn some of it into 429s.
+    os.environ['ADMISSION_CONTROL'] = 'off'
+    import app as store_app
+
+    statements = set()
+    observe = store_app.db_pool.on_query
+    def capture(sql, seconds):
+        statements.add(' '.join(sql.split()))
+        if observe:
+            observe(sql, seconds)
+    store_app.db_pool.on_query = capture
+    store_app.ADMIN_TOKEN = 'plan-check' # For admin-only endpoints such as the order export
+
+    _exercise_app(store_app.create_app().test_client())
+
+    # No ANALYZE: with a handful of rows the planner would rightly prefer scans. Without
+    # statistics it assumes large tables, which is what production plans look like.
+    conn = sqlite3.connect(DATABASE_NAME)
+    for sql in statements:
+        if sql.upper().startswith('CREATE TEMP'):
+            conn.execute(sql) # Temporary tables that statements below refer to
+    violations = []
+    checked = 0
+    for sql in sorted(statements):
+        if not re.match(r'^(WITH|SELECT|INSERT|UPDATE|DELETE)\b', sql, re.IGNORECASE):
+            continue # BEGIN, COMMIT, SAVEPOINT, PRAGMA ...
+        checked += 1
+        scans = _plan_scans(conn, sql)
+        if scans and not any(sql.startswith(prefix) for prefix in ALLOWED_SCANS):
+            violations.append((sql, scans))
+    conn.close()
+    print(f"Checked query plans for {checked} statements.")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['status', 'migrate', 'check-plans'])
+    parser.add_argument('--db', default=DATABASE_NAME)
+    args = parser.parse_args()
+
+    if args.command == 'check-plans':
+        violations = check_query_plans()
+        for sql, scans in violations:
+            print(f"FULL SCAN ({'; '.join(scans)}): {sql}")
+        if violations:
+            print(f"{len(violations)} statement(s) fall back to a full table scan.")
+            return 1
+        print("OK: no hot query does a full table scan.")
+        return 0
+
+    conn = sqlite3.connect(args.db)
+    if args.command == 'migrate':
+        applied = migrate(conn)
+        print(f"Applied {len(applied)} migration(s)." if applied else "Already up to date.")
+    print(f"Schema version {schema_version(conn)} (latest {LATEST_VERSION}).")
+    conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+_WORD = re.compile(r'\w+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize(text):
+    return _WHITESPACE.sub(' ', text.lower()).strip()
+
+class PrefixIndex:
+    """In-memory typeahead over product names: sorted key arrays searched with bisect.
+
+    Every name contributes its normalised full text ("iron pickaxe") to one array and
+    the text from each later word onwards ("pickaxe") to another, so a query matches
+    the start of the name or the start of any word. Names that start with the query
+    are suggested first, then word matches, each in alphabetical order.
+
+    The index is stale once the shared version (version_source, e.g. the names-only
+    version from catalog_version.py) has moved, which covers writes from any process,
+    or once mark_stale() was called here. The next lookup then starts a rebuild on a background
+    thread and keeps answering from the previous arrays until the new ones are swapped
+    in, so suggestions can lag a write by one rebuild. Lookups never read product rows
+    once the first build is done.
+    """
+
+    def __init__(self, load_names, version_source=None):
+        # load_names() -> iterable of (id, name) for the whole catalog.
+        self._load_names = load_names
+        self._version_source = version_source
+        self._arrays = None # (name_keys, name_ids, word_keys, word_ids, names by id)
+        self._changes = 0 # bumped by mark_stale()
+        self._built_version = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.last_build_seconds = None
+        self.builds = 0
+
+    def mark_stale(self):
+        with self._lock:
+            self._changes += 1
+
+    def _version(self):
+        shared = self._version_source() if self._version_source is not None else None
+        return (shared, self._changes)
+
+    def _is_current(self, version):
+        # Called with the lock held. While the shared version is unknown (None), keep
+        # serving what was built rather than rebuilding blindly.
+        if self._version_source is not None and version[0] is None:
+            return True
+        return self._built_version == version
+
+    def _build(self):
+        # Taken before reading, so a write landing during the read leaves it stale.
+        version = self._version()
+        started = time.perf_counter()
+        name_entries = []
+        word_entries = []
+        names = {}
+        for product_id, name in self._load_names():
+            text = normalize(name or '')
+            if not text:
+                continue
+            names[product_id] = name
+            name_entries.append((text, product_id))
+            for match in _WORD.finditer(text):
+                if match.start() > 0:
+                    word_entries.append((text[match.start():], product_id))
+        name_entries.sort()
+        word_entries.sort()
+        arrays = ([key for key, _ in name_entries], array('q', (pid for _, pid in name_entries)),
+                  [key for key, _ in word_entries], array('q', (pid for _, pid in word_entries)), names)
+        with self._lock:
+            self._arrays = arrays
+            self._built_version = version
+            self.builds += 1
+            self.last_build_seconds = time.perf_counter() - started
+
+    def _rebuild_in_background(self):
+        try:
+            # Loop so writes that land during a rebuild are picked up by one more pass.
+            while True:
+                with self._build_lock:
+                    self._build()
+                version = self._version()
+                with self._lock:
+                    if self._is_current(version):
+                        self._rebuilding = False
+                        return
+        except Exception as e:
+            print(f"Autocomplete index rebuild failed: {e}")
+            with self._lock:
+                self._rebuilding = False
+
+    def _current_arrays(self):
+        version = self._version()
+        with self._lock:
+            arrays = self._arrays
+            start_rebuild = arrays is not None and not self._is_current(version) and not self._rebuilding
+            if start_rebuild:
+                self._rebuilding = True
+        if arrays is None:
+            # First lookup: nothing to serve yet, so build in the foreground.
+            with self._build_lock:
+                if self._arrays is None:
+                    self._build()
+            return self._arrays
+        if start_rebuild:
+            threading.Thread(target=self._rebuild_in_background, name='prefix-index-rebuild', daemon=True).start()
+        return arrays
+
+    def suggest(self, query, limit=10):
+        """Return up to `limit` [{'id', 'name'}] whose name, or a word in it, starts with query."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        name_keys, name_ids, word_keys, word_ids, names = self._current_arrays()
+        found = []
+        seen = set()
+        for keys, ids in ((name_keys, name_ids), (word_keys, word_ids)):
+            position = bisect_left(keys, prefix)
+            while position < len(keys) and len(found) < limit and keys[position].startswith(prefix):
+                product_id = ids[position]
+                if product_id not in seen:
+                    seen.add(product_id)
+                    found.append({'id': product_id, 'name': names[product_id]})
+                position += 1
+        return found
+
+    def stats(self):
+        with self._lock:
+            arrays = self._arrays
+            return {
+                'built': arrays is not None,
+                'names': len(arrays[0]) if arrays else 0,
+                'word_keys': len(arrays[2]) if arrays else 0,
+                'built_version': self._built_version[0] if self._built_version else None,
+                'rebuilding': self._rebuilding,
+                'builds_total': self.builds,
+                'last_build_seconds': round(self.last_build_seconds, 4) if self.last_build_seconds is not None else None,
+            }
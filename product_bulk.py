@@ -0,0 +1,159 @@
+"""Bulk create / patch / delete of products, each batch in one transaction.
+
+Every function takes an open connection inside the caller's write transaction and
+returns one result dict per input item, in input order: {'index', 'status', ...}.
+Existence and name-uniqueness checks are set-based (chunked IN lookups) and the
+writes use executemany, so a batch costs a handful of statements, not one per item.
+"""
+import numbers
+
+from db_pool import LOOKUP_CHUNK_SIZE
+
+PRODUCT_COLUMNS = ('name', 'description', 'price', 'image_url', 'stock_quantity')
+
+class BulkItemErrors(Exception):
+    """Raised in atomic mode when any item failed, so the transaction rolls back."""
+
+    def __init__(self, results):
+        super().__init__('Some items failed; nothing was written.')
+        self.results = results
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _lookup(conn, sql, values):
+    # sql has a single {placeholders} slot for an IN list.
+    rows = []
+    for chunk in _chunks(values):
+        rows.extend(conn.execute(sql.format(placeholders=', '.join('?' * len(chunk))), chunk).fetchall())
+    return rows
+
+def _validate_fields(item, partial):
+    # Same rules as the single-product endpoints: a name and a price are required on
+    # create and may not be blanked on update.
+    if not partial or 'name' in item:
+        name = item.get('name')
+        if not isinstance(name, str) or not name.strip():
+            return "'name' is required and must be a non-empty string"
+    if not partial or 'price' in item:
+        price = item.get('price')
+        if isinstance(price, bool) or not isinstance(price, numbers.Real) or price < 0:
+            return "'price' is required and must be a non-negative number"
+    if 'stock_quantity' in item:
+        stock = item['stock_quantity']
+        if isinstance(stock, bool) or not isinstance(stock, int) or stock < 0:
+            return "'stock_quantity' must be a non-negative integer"
+    unknown = set(item) - set(PRODUCT_COLUMNS) - {'id'}
+    if unknown:
+        return f"Unknown field(s): {', '.join(sorted(unknown))}"
+    return None
+
+def _finish(results, atomic):
+    if atomic and any(result['status'] == 'error' for result in results):
+        raise BulkItemErrors(results)
+    return results
+
+def bulk_create(conn, items, atomic=False):
+    results = [None] * len(items)
+    candidates = {} # name -> index of the first item that wants it
+    for index, item in enumerate(items):
+        error = 'Each item must be an object' if not isinstance(item, dict) else _validate_fields(item, partial=False)
+        if error is None and 'id' in item:
+            error = "'id' is assigned by the server"
+        if error is None and item['name'] in candidates:
+            error = f"Duplicate name '{item['name']}' in this batch"
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            candidates[item['name']] = index
+
+    taken = {row[0] for row in _lookup(conn, "SELECT name FROM products WHERE name IN ({placeholders})",
+                                       list(candidates))}
+    for name in taken:
+        index = candidates.pop(name)
+        results[index] = {'index': index, 'status': 'error', 'error': f"A product named '{name}' already exists"}
+
+    conn.executemany(
+        "INSERT INTO products (name, description, price, image_url, stock_quantity) VALUES (?, ?, ?, ?, ?)",
+        [(items[index]['name'], items[index].get('description'), items[index]['price'],
+          items[index].get('image_url'), items[index].get('stock_quantity', 0)) for index in candidates.values()]
+    )
+    # executemany doesn't report row ids; names are unique, so read them back in one pass.
+    for product_id, name in _lookup(conn, "SELECT id, name FROM products WHERE name IN ({placeholders})",
+                                    list(candidates)):
+        index = candidates[name]
+        results[index] = {'index': index, 'status': 'created', 'id': product_id}
+    return _finish(results, atomic)
+
+def bulk_patch(conn, items, atomic=False):
+    results = [None] * len(items)
+    patches = {} # id -> index
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            error = 'Each item must be an object'
+        elif isinstance(item.get('id'), bool) or not isinstance(item.get('id'), int):
+            error = "'id' is required and must be an integer"
+        elif len(item) == 1:
+            error = 'No fields to update'
+        else:
+            error = _validate_fields(item, partial=True)
+        if error is None and item['id'] in patches:
+            error = f"Product {item['id']} appears more than once in this batch"
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            patches[item['id']] = index
+
+    current = {row['id']: dict(row) for row in _lookup(
+        conn, f"SELECT id, {', '.join(PRODUCT_COLUMNS)} FROM products WHERE id IN ({{placeholders}})", list(patches))}
+    for product_id in [product_id for product_id in patches if product_id not in current]:
+        index = patches.pop(product_id)
+        results[index] = {'index': index, 'status': 'error', 'error': f'Product {product_id} not found'}
+
+    # Renames must not collide with another product's name or with each other.
+    renames = {} # new name -> id
+    for product_id, index in list(patches.items()):
+        name = items[index].get('name')
+        if name is None or name == current[product_id]['name']:
+            continue
+        if name in renames:
+            patches.pop(product_id)
+            results[index] = {'index': index, 'status': 'error', 'error': f"Duplicate name '{name}' in this batch"}
+        else:
+            renames[name] = product_id
+    for owner_id, name in _lookup(conn, "SELECT id, name FROM products WHERE name IN ({placeholders})", list(renames)):
+        product_id = renames[name]
+        if owner_id != product_id and product_id in patches:
+            index = patches.pop(product_id)
+            results[index] = {'index': index, 'status': 'error', 'error': f"A product named '{name}' already exists"}
+
+    rows = []
+    for product_id, index in patches.items():
+        merged = {column: items[index].get(column, current[product_id][column]) for column in PRODUCT_COLUMNS}
+        rows.append(tuple(merged[column] for column in PRODUCT_COLUMNS) + (product_id,))
+        results[index] = {'index': index, 'status': 'updated', 'id': product_id}
+    conn.executemany(
+        f"UPDATE products SET {', '.join(f'{column} = ?' for column in PRODUCT_COLUMNS)} WHERE id = ?", rows)
+    return _finish(results, atomic)
+
+def bulk_delete(conn, ids, atomic=False):
+    results = [None] * len(ids)
+    targets = {} # id -> index
+    for index, product_id in enumerate(ids):
+        if isinstance(product_id, bool) or not isinstance(product_id, int):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Each id must be an integer'}
+        elif product_id in targets:
+            results[index] = {'index': index, 'status': 'error',
+                              'error': f'Product {product_id} appears more than once in this batch'}
+        else:
+            targets[product_id] = index
+
+    existing = {row[0] for row in _lookup(conn, "SELECT id FROM products WHERE id IN ({placeholders})", list(targets))}
+    for product_id, index in targets.items():
+        if product_id in existing:
+            results[index] = {'index': index, 'status': 'deleted', 'id': product_id}
+        else:
+            results[index] = {'index': index, 'status': 'error', 'error': f'Product {product_id} not found'}
+    conn.executemany("DELETE FROM products WHERE id = ?", [(product_id,) for product_id in existing])
+    return _finish(results, atomic)
@@ -0,0 +1,374 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from db_pool import LOOKUP_CHUNK_SIZE, run_immediate_transaction
+
+# Spreadsheet column -> products column
+IMPORT_COLUMNS = {
+    'Name': 'name',
+    'Price': 'price',
+    'Stock Quantity': 'stock_quantity',
+    'Description': 'description',
+    'Image URL': 'image_url',
+}
+
+# Rows hashed and compared against the stored hashes at a time.
+COMPARE_BATCH_SIZE = 5000
+# Rows parsed into memory at a time by the streaming readers.
+IMPORT_CHUNK_SIZE = 10000
+# Per-row messages kept for the response; the total is still counted past this.
+MAX_REPORTED_ROW_ERRORS = 1000
+
+# Columns covered by products.content_hash. The import compares hashes to skip rows that
+# did not change; any other write to these columns clears the stored hash (trigger from
+# migrations.add_content_hash), so the next import rewrites that row once.
+CONTENT_HASH_COLUMNS = ('price', 'description', 'image_url', 'stock_quantity')
+
+# New and changed rows are staged in a temporary table on the importing connection while
+# the file is read, and only applied once it has been read and validated in full. The
+# primary key keeps one row per name: the last one in the file wins, as before.
+CREATE_STAGED_PRODUCTS_SQL = """CREATE TEMP TABLE IF NOT EXISTS import_changes (
+                                    name TEXT PRIMARY KEY,
+                                    description TEXT,
+                                    price REAL,
+                                    image_url TEXT,
+                                    stock_quantity INTEGER,
+                                    content_hash INTEGER)"""
+
+STAGE_PRODUCT_SQL = """INSERT OR REPLACE INTO temp.import_changes
+                           (name, description, price, image_url, stock_quantity, content_hash)
+                       VALUES (?, ?, ?, ?, ?, ?)"""
+
+# One statement applies every staged row. The WHERE clause compares the hashes again at
+# write time, so a product that matches the file by then is still left untouched.
+APPLY_STAGED_PRODUCTS_SQL = """INSERT INTO products (name, description, price, image_url, stock_quantity, content_hash)
+                               SELECT name, description, price, image_url, stock_quantity, content_hash
+                               FROM temp.import_changes WHERE true
+                               ON CONFLICT(name) DO UPDATE SET
+                                   description = excluded.description,
+                                   price = excluded.price,
+                                   image_url = excluded.image_url,
+                                   stock_quantity = excluded.stock_quantity,
+                                   content_hash = excluded.content_hash
+                               WHERE products.content_hash IS NOT excluded.content_hash"""
+
+def _column(df, name):
+    # A missing optional column behaves like a column of blanks, as row.get() did before.
+    if name in df.columns:
+        return df[name]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+def _clean_text(series):
+    # str(value).strip() for present values, None for missing ones.
+    present = series.notna()
+    cleaned = series.astype(object).where(~present, series.astype(str).str.strip())
+    return cleaned.where(present, None)
+
+class ImportFileError(Exception):
+    """The uploaded file could not be read (bad format, missing optional reader)."""
+
+class ImportRowErrors(Exception):
+    """Some rows failed validation; raised after every row was checked, with nothing written."""
+
+    def __init__(self, result):
+        super().__init__(f"{result['error_count']} row(s) failed validation")
+        self.result = result
+
+def _xlsx_chunks(stream, chunk_size):
+    # openpyxl read-only mode parses the sheet XML lazily, one row at a time.
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Failed to read Excel: {str(e)}')
+    try:
+        # Same sheet pd.read_excel() used to read: the first one.
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h).strip() if h is not None else f'Unnamed: {i}' for i, h in enumerate(header)]
+        width = len(columns)
+        buffer = []
+        row_numbers = []
+        for row_number, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue # Blank rows in the sheet are not products
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            buffer.append(row)
+            row_numbers.append(row_number)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame.from_records(buffer, columns=columns, index=row_numbers)
+                buffer = []
+                row_numbers = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=columns, index=row_numbers)
+    finally:
+        workbook.close()
+
+def _csv_chunks(stream, chunk_size):
+    try:
+        # dtype=str keeps values as written (e.g. a Name of "007"); validation converts.
+        reader = pd.read_csv(stream, chunksize=chunk_size, dtype=str, skip_blank_lines=True)
+        for chunk in reader:
+            chunk.index = chunk.index + 2 # header row + 1-indexed rows
+            yield chunk
+    except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
+        raise ImportFileError(f'Failed to read CSV: {str(e)}')
+
+def _parquet_chunks(stream, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportFileError('Parquet uploads require the optional pyarrow package.')
+    try:
+        parquet_file = pq.ParquetFile(stream)
+        offset = 2
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            chunk.index = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    except Exception as e:
+        if isinstance(e, ImportFileError):
+            raise
+        raise ImportFileError(f'Failed to read Parquet: {str(e)}')
+
+CHUNK_READERS = {
+    'xlsx': _xlsx_chunks,
+    'csv': _csv_chunks,
+    'parquet': _parquet_chunks,
+}
+
+def read_product_chunks(stream, file_type, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows, indexed by spreadsheet row number."""
+    return CHUNK_READERS[file_type](stream, chunk_size)
+
+def validate_products_frame(df):
+    """Validate a DataFrame of spreadsheet rows column-wise.
+
+    Returns (records, row_errors): records is a DataFrame with the products columns for
+    the valid rows, row_errors a list of messages (first problem per row, as before).
+    df's index holds the spreadsheet row numbers used in the messages.
+    """
+    row_numbers = df.index.to_numpy()
+
+    raw_name = _column(df, 'Name')
+    name = _clean_text(raw_name)
+    name_missing = name.isna() | (name == '')
+
+    raw_price = _column(df, 'Price')
+    price = pd.to_numeric(raw_price, errors='coerce')
+    price_missing = ~name_missing & raw_price.isna()
+    price_invalid = ~name_missing & ~price_missing & price.isna()
+
+    raw_stock = _column(df, 'Stock Quantity')
+    stock_blank = raw_stock.isna() | (raw_stock.astype(str).str.strip() == '')
+    stock = pd.to_numeric(raw_stock.where(~stock_blank), errors='coerce')
+    already_failed = name_missing | price_missing | price_invalid
+    stock_invalid = ~already_failed & ~stock_blank & (stock.isna() | np.isinf(stock))
+
+    row_errors = []
+    # Only the (usually few) failing rows are visited one by one to build messages.
+    failed = name_missing | price_missing | price_invalid | stock_invalid
+    for pos in np.flatnonzero(failed.to_numpy()):
+        row_number = row_numbers[pos]
+        if name_missing.iat[pos]:
+            row_errors.append(f"Row {row_number}: 'Name' is missing or empty.")
+        elif price_missing.iat[pos]:
+            row_errors.append(f"Row {row_number}: 'Price' is missing for product '{name.iat[pos]}'.")
+        elif price_invalid.iat[pos]:
+            row_errors.append(f"Row {row_number}: 'Price' for '{name.iat[pos]}' ('{raw_price.iat[pos]}') is not a valid number.")
+        else:
+            row_errors.append(f"Row {row_number}: 'Stock Quantity' for '{name.iat[pos]}' ('{raw_stock.iat[pos]}') is not a valid integer.")
+
+    valid = ~failed
+    records = pd.DataFrame({
+        'name': name[valid],
+        'description': _clean_text(_column(df, 'Description'))[valid],
+        'price': price[valid].astype(float),
+        'image_url': _clean_text(_column(df, 'Image URL'))[valid],
+        # int(float(x)) semantics: "10.0" -> 10, blanks -> 0
+        'stock_quantity': stock[valid].fillna(0).astype(np.int64),
+    })
+    return records, row_errors
+
+def content_hashes(records):
+    """A 64-bit hash per record over CONTENT_HASH_COLUMNS, as signed ints SQLite can store.
+
+    Computed column-wise by pandas, so hashing a chunk costs about as much as validating it.
+    """
+    hashes = pd.util.hash_pandas_object(records[list(CONTENT_HASH_COLUMNS)], index=False)
+    return pd.Series(hashes.to_numpy().view(np.int64), index=records.index)
+
+def existing_content_hashes(cursor, names):
+    """name -> content_hash (None if stale) for the names that exist or are already staged.
+
+    A staged row takes precedence over the table, so a name repeated in a later chunk
+    is compared with the row that would otherwise win.
+    """
+    existing = {}
+    for start in range(0, len(names), LOOKUP_CHUNK_SIZE):
+        chunk = names[start:start + LOOKUP_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"SELECT name, content_hash FROM products WHERE name IN ({placeholders})", chunk)
+        existing.update(cursor.fetchall())
+        cursor.execute(f"SELECT name, content_hash FROM temp.import_changes WHERE name IN ({placeholders})", chunk)
+        existing.update(cursor.fetchall())
+    return existing
+
+def stage_products(cursor, records, batch_size=COMPARE_BATCH_SIZE):
+    """Stage new and changed records in temp.import_changes. Returns (added, updated, unchanged).
+
+    Rows whose content hash matches the stored one are not staged at all, so a re-import
+    of an unchanged catalog stages nothing and never writes to the database.
+    """
+    added = 0
+    updated = 0
+    unchanged = 0
+    for start in range(0, len(records), batch_size):
+        batch = records.iloc[start:start + batch_size]
+        names = batch['name']
+        hashes = content_hashes(batch)
+        existing = existing_content_hashes(cursor, names.drop_duplicates().tolist())
+        known = names.isin(existing.keys())
+        # A name is "added" the first time it appears and was not already in the table;
+        # repeats (in the table or earlier in the file) count as updates, as before.
+        is_new = ~known & ~names.duplicated()
+        # Compared as Python ints: a stale (NULL) hash would turn a mapped Series into
+        # float64, which cannot hold every 64-bit hash exactly.
+        same_hash = pd.Series([existing.get(name) == content_hash
+                               for name, content_hash in zip(names.tolist(), hashes.tolist())], index=batch.index)
+        # Names repeated within the batch are always staged, so the last row still wins.
+        is_unchanged = same_hash & ~names.duplicated(keep=False)
+        batch_added = int(is_new.sum())
+        batch_unchanged = int(is_unchanged.sum())
+        added += batch_added
+        unchanged += batch_unchanged
+        updated += len(batch) - batch_added - batch_unchanged
+
+        changed = ~is_unchanged
+        rows = zip(
+            names[changed].tolist(),
+            batch['description'][changed].tolist(),
+            batch['price'][changed].tolist(),
+            batch['image_url'][changed].tolist(),
+            batch['stock_quantity'][changed].tolist(),
+            hashes[changed].tolist(),
+        )
+        cursor.executemany(STAGE_PRODUCT_SQL, rows)
+    return added, updated, unchanged
+
+def apply_staged_products(conn, delete_missing=False):
+    """Write the staged rows; with delete_missing, also delete the products not in the file.
+
+    Runs inside the caller's write transaction. Returns (products inserted or updated,
+    products deleted); staged rows that matched by write time are not counted.
+    """
+    written = conn.execute(APPLY_STAGED_PRODUCTS_SQL).rowcount
+    if not delete_missing:
+        return written, 0
+    return written, conn.execute("DELETE FROM products WHERE name NOT IN (SELECT name FROM temp.import_names)").rowcount
+
+def import_product_chunks(conn, chunks, progress=None, timings=None, delete_missing=False):
+    """Validate a stream of chunks, stage the new and changed rows, then apply them.
+
+    Reading, validating and comparing content hashes run outside any write transaction,
+    so conn must be a connection of its own that is not in one (not the write queue's):
+    the staged rows live in temporary tables on it. Only the final apply takes the write
+    lock, in one BEGIN IMMEDIATE transaction that is committed here; an import with
+    nothing to change never takes it.
+
+    Only one chunk is held in memory at a time. Once any row fails validation nothing
+    more is staged, but the remaining chunks are still validated so every row error is
+    reported, and ImportRowErrors is raised at the end without writing anything.
+    progress, if given, is called after every chunk with the running counts; its
+    rows_staged are only queued for the apply, and the result's rows_written counts what
+    the apply actually wrote once it committed. Per-phase time ('read', 'validate',
+    'compare' for hashing and staging, 'write' for the write transaction) is added to the
+    result, and reported to timings(phase, seconds) if given.
+
+    With delete_missing, products whose name is not in the file are deleted in the same
+    transaction (the file is then the whole catalog). The names seen are collected in a
+    temporary table, so this does not need them all in memory either.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    rows = validated = added = updated = unchanged = written = removed = error_count = 0
+    row_errors = []
+    phase_seconds = {'read': 0.0, 'validate': 0.0, 'compare': 0.0, 'write': 0.0}
+
+    def record(phase, since):
+        now = time.perf_counter()
+        phase_seconds[phase] += now - since
+        if timings:
+            timings(phase, now - since)
+        return now
+
+    try:
+        cursor.execute(CREATE_STAGED_PRODUCTS_SQL)
+        if delete_missing:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS import_names (name TEXT PRIMARY KEY)")
+
+        chunks = iter(chunks)
+        while True:
+            phase_started = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            phase_started = record('read', phase_started)
+            records, chunk_errors = validate_products_frame(chunk)
+            phase_started = record('validate', phase_started)
+            rows += len(chunk)
+            validated += len(records)
+            if chunk_errors:
+                error_count += len(chunk_errors)
+                row_errors.extend(chunk_errors[:MAX_REPORTED_ROW_ERRORS - len(row_errors)])
+            elif not error_count:
+                chunk_added, chunk_updated, chunk_unchanged = stage_products(cursor, records)
+                added += chunk_added
+                updated += chunk_updated
+                unchanged += chunk_unchanged
+                if delete_missing:
+                    cursor.executemany("INSERT OR IGNORE INTO temp.import_names (name) VALUES (?)",
+                                       ((name,) for name in records['name'].tolist()))
+                # Staging only writes to the temporary database; committing ends the read
+                # snapshot the lookups opened, so none is held while the next chunk is read.
+                conn.commit()
+                record('compare', phase_started)
+            if progress:
+                progress(rows_parsed=rows, rows_validated=validated, rows_staged=added + updated,
+                         error_count=error_count)
+
+        if delete_missing and not error_count and not validated:
+            raise ImportFileError('The file has no product rows; refusing to delete every product.')
+        if not error_count and (added or updated or delete_missing):
+            phase_started = time.perf_counter()
+            written, removed = run_immediate_transaction(conn, lambda conn: apply_staged_products(conn, delete_missing))
+            record('write', phase_started)
+    finally:
+        # conn goes back to the pool, so it must not keep the staging tables.
+        if conn.in_transaction:
+            conn.rollback()
+        cursor.execute("DROP TABLE IF EXISTS temp.import_changes")
+        cursor.execute("DROP TABLE IF EXISTS temp.import_names")
+
+    elapsed = time.perf_counter() - started
+    result = {
+        'rows': rows,
+        'added': added,
+        'updated': updated,
+        'unchanged': unchanged,
+        'removed': removed,
+        'rows_written': written,
+        'row_errors': row_errors,
+        'error_count': error_count,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'phase_seconds': {phase: round(seconds, 3) for phase, seconds in phase_seconds.items()},
+    }
+    if error_count:
+        raise ImportRowErrors(result)
+    return result
@@ -0,0 +1,149 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PROFILE_MODES = ('cprofile', 'sample')
+PROFILE_EXTENSIONS = {'cprofile': '.pstats', 'sample': '.collapsed'}
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread.
+
+    The result is in collapsed-stack format ("outer;inner;leaf count" per line), which
+    flamegraph.pl and speedscope read directly. The profiled thread itself runs
+    untouched, so timings are not skewed the way deterministic profiling skews them.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+class ProfileStore:
+    """Profiles saved as files in one directory, newest kept up to max_files."""
+
+    NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+\.(pstats|collapsed)$')
+
+    def __init__(self, directory, max_files=200):
+        self.directory = directory
+        self.max_files = max_files
+        # Only one request is profiled at a time; others are served normally.
+        self._busy = threading.Lock()
+
+    def start(self, mode, label):
+        """Start profiling the current thread; returns None if mode is unknown or busy."""
+        if mode not in PROFILE_MODES or not self._busy.acquire(blocking=False):
+            return None
+        try:
+            return ActiveProfile(self, mode, label)
+        except Exception:
+            self._busy.release()
+            raise
+
+    def _finish(self, active):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, active.name)
+            if active.mode == 'cprofile':
+                active.profiler.dump_stats(path)
+            else:
+                active.profiler.dump(path)
+            self._prune()
+        finally:
+            self._busy.release()
+
+    def _prune(self):
+        names = sorted(self.list_names(), reverse=True)
+        for name in names[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list_names(self):
+        try:
+            return [name for name in os.listdir(self.directory) if self.NAME_PATTERN.match(name)]
+        except FileNotFoundError:
+            return []
+
+    def list(self):
+        profiles = []
+        for name in sorted(self.list_names(), reverse=True):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            profiles.append({'name': name, 'bytes': stat.st_size, 'created_at': stat.st_mtime,
+                             'format': name.rsplit('.', 1)[1]})
+        return profiles
+
+    def path(self, name):
+        # Only names this store wrote can be read back; no path traversal.
+        if not self.NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def summary(self, name, limit=50):
+        """Human-readable top functions by cumulative time for a .pstats profile."""
+        path = self.path(name)
+        if path is None or not name.endswith('.pstats'):
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+class ActiveProfile:
+    def __init__(self, store, mode, label):
+        self.store = store
+        self.mode = mode
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:60] or 'root'
+        self.name = f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}{PROFILE_EXTENSIONS[mode]}"
+        self.started = time.perf_counter()
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = SamplingProfiler(threading.get_ident())
+            self.profiler.start()
+
+    def stop(self):
+        """Stop and save; returns the elapsed seconds."""
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        elapsed = time.perf_counter() - self.started
+        self.store._finish(self)
+        return elapsed
@@ -0,0 +1,198 @@
+"""Sales rollups: per-day and per-product totals kept up to date by checkout.
+
+Reports read these small tables instead of grouping over orders/order_items, so
+their cost depends on the date range asked for, not on how many orders exist.
+
+    python sales_rollups.py rebuild [--db store.db] [--chunk-size 5000]
+"""
+import argparse
+import sqlite3
+
+from db_pool import run_immediate_transaction
+
+REBUILD_CHUNK_SIZE = 5000
+
+def record_order(conn, order_id, order_lines):
+    """Add one order to the rollups; call inside the transaction that inserted it.
+
+    order_lines is [(product_id, quantity, price_per_item), ...] as written to order_items.
+    """
+    # Same UTC day that orders.created_at (CURRENT_TIMESTAMP) recorded.
+    day = conn.execute("SELECT date(created_at) FROM orders WHERE id = ?", (order_id,)).fetchone()[0]
+    per_product = {}
+    for product_id, quantity, price in order_lines:
+        units, revenue = per_product.get(product_id, (0, 0.0))
+        per_product[product_id] = (units + quantity, revenue + quantity * price)
+    units = sum(units for units, _ in per_product.values())
+    revenue = sum(revenue for _, revenue in per_product.values())
+
+    conn.execute("""INSERT INTO sales_daily (day, orders, units, revenue) VALUES (?, 1, ?, ?)
+                    ON CONFLICT(day) DO UPDATE SET
+                        orders = orders + 1,
+                        units = units + excluded.units,
+                        revenue = revenue + excluded.revenue""",
+                 (day, units, revenue))
+    add_product_sales(conn, [(day, product_id, units, revenue)
+                             for product_id, (units, revenue) in per_product.items()])
+
+def add_product_sales(conn, rows):
+    # rows: [(day, product_id, units, revenue), ...]
+    conn.executemany("""INSERT INTO sales_daily_product (day, product_id, units, revenue) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(day, product_id) DO UPDATE SET
+                            units = units + excluded.units,
+                            revenue = revenue + excluded.revenue""",
+                     rows)
+    conn.executemany("""INSERT INTO product_sales_totals (product_id, units, revenue) VALUES (?, ?, ?)
+                        ON CONFLICT(product_id) DO UPDATE SET
+                            units = units + excluded.units,
+                            revenue = revenue + excluded.revenue""",
+                     [(product_id, units, revenue) for _, product_id, units, revenue in rows])
+
+def backfill_rollups(conn):
+    """Fill empty rollup tables from history with set-based statements.
+
+    Runs inside the caller's transaction (the schema migration that creates the
+    tables); use rebuild_rollups() to recompute a live store without a long lock.
+    """
+    conn.execute("""INSERT INTO sales_daily_product (day, product_id, units, revenue)
+                    SELECT date(o.created_at), oi.product_id, SUM(oi.quantity), SUM(oi.quantity * oi.price_per_item)
+                    FROM order_items oi JOIN orders o ON o.id = oi.order_id
+                    GROUP BY date(o.created_at), oi.product_id""")
+    conn.execute("""INSERT INTO product_sales_totals (product_id, units, revenue)
+                    SELECT product_id, SUM(units), SUM(revenue) FROM sales_daily_product GROUP BY product_id""")
+    conn.execute("""INSERT INTO sales_daily (day, orders, units, revenue)
+                    SELECT date(created_at), COUNT(*), 0, 0 FROM orders GROUP BY date(created_at)""")
+    conn.execute("""UPDATE sales_daily SET units = totals.units, revenue = totals.revenue
+                    FROM (SELECT day, SUM(units) AS units, SUM(revenue) AS revenue
+                          FROM sales_daily_product GROUP BY day) AS totals
+                    WHERE sales_daily.day = totals.day""")
+
+def rebuild_rollups(conn, chunk_size=REBUILD_CHUNK_SIZE, progress=None):
+    """Recompute all rollups from orders/order_items, one short transaction per chunk.
+
+    The first transaction empties the rollups and notes the highest order and order
+    item ids. Checkouts keep running meanwhile and add themselves as usual; the chunks
+    only fold in history up to those ids, so nothing is counted twice or missed.
+    Reports show partial totals until the rebuild finishes.
+    """
+    def reset(conn):
+        for table in ('sales_daily', 'sales_daily_product', 'product_sales_totals'):
+            conn.execute(f"DELETE FROM {table}")
+        return (conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0],
+                conn.execute("SELECT COALESCE(MAX(id), 0) FROM order_items").fetchone()[0])
+
+    max_order_id, max_item_id = run_immediate_transaction(conn, reset)
+    orders_done = items_done = 0
+
+    # Order counts per day, walking orders by id.
+    last_id = 0
+    while last_id < max_order_id:
+        def fold_orders(conn):
+            rows = conn.execute("""SELECT id, date(created_at) FROM orders
+                                   WHERE id > ? AND id <= ? ORDER BY id LIMIT ?""",
+                                (last_id, max_order_id, chunk_size)).fetchall()
+            per_day = {}
+            for _, day in rows:
+                per_day[day] = per_day.get(day, 0) + 1
+            conn.executemany("""INSERT INTO sales_daily (day, orders, units, revenue) VALUES (?, ?, 0, 0)
+                                ON CONFLICT(day) DO UPDATE SET orders = orders + excluded.orders""",
+                             list(per_day.items()))
+            return rows[-1][0] if rows else max_order_id, len(rows)
+        last_id, count = run_immediate_transaction(conn, fold_orders)
+        orders_done += count
+        if progress:
+            progress(orders=orders_done, order_items=items_done)
+
+    # Units and revenue, walking order_items by id (its primary key, so each chunk is a
+    # range scan plus a primary-key lookup of the order's day).
+    last_id = 0
+    while last_id < max_item_id:
+        def fold_items(conn):
+            rows = conn.execute("""SELECT oi.id, date(o.created_at), oi.product_id,
+                                          oi.quantity, oi.quantity * oi.price_per_item
+                                   FROM order_items oi JOIN orders o ON o.id = oi.order_id
+                                   WHERE oi.id > ? AND oi.id <= ? ORDER BY oi.id LIMIT ?""",
+                                (last_id, max_item_id, chunk_size)).fetchall()
+            per_day = {}
+            per_product = {}
+            for _, day, product_id, quantity, revenue in rows:
+                units, total = per_day.get(day, (0, 0.0))
+                per_day[day] = (units + quantity, total + revenue)
+                units, total = per_product.get((day, product_id), (0, 0.0))
+                per_product[(day, product_id)] = (units + quantity, total + revenue)
+            conn.executemany("""INSERT INTO sales_daily (day, orders, units, revenue) VALUES (?, 0, ?, ?)
+                                ON CONFLICT(day) DO UPDATE SET
+                                    units = units + excluded.units,
+                                    revenue = revenue + excluded.revenue""",
+                             [(day, units, revenue) for day, (units, revenue) in per_day.items()])
+            add_product_sales(conn, [(day, product_id, units, revenue)
+                                     for (day, product_id), (units, revenue) in per_product.items()])
+            return rows[-1][0] if rows else max_item_id, len(rows)
+        last_id, count = run_immediate_transaction(conn, fold_items)
+        items_done += count
+        if progress:
+            progress(orders=orders_done, order_items=items_done)
+
+    return {'orders': orders_done, 'order_items': items_done}
+
+def _date_range_clause(column, start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end:
+        clauses.append(f"{column} <= ?")
+        params.append(end)
+    return (' AND '.join(clauses) if clauses else '1'), params
+
+def daily_sales(conn, start=None, end=None):
+    where, params = _date_range_clause('day', start, end)
+    rows = conn.execute(f"""SELECT day, orders, units, revenue FROM sales_daily
+                            WHERE {where} ORDER BY day""", params).fetchall()
+    return [{'day': day, 'orders': orders, 'units': units, 'revenue': round(revenue, 2)}
+            for day, orders, units, revenue in rows]
+
+def product_sales(conn, product_id, start=None, end=None):
+    where, params = _date_range_clause('day', start, end)
+    rows = conn.execute(f"""SELECT day, units, revenue FROM sales_daily_product
+                            WHERE product_id = ? AND {where} ORDER BY day""", [product_id] + params).fetchall()
+    return [{'day': day, 'units': units, 'revenue': round(revenue, 2)} for day, units, revenue in rows]
+
+TOP_SELLER_METRICS = ('revenue', 'units')
+
+def top_sellers(conn, by='revenue', limit=10, start=None, end=None):
+    if by not in TOP_SELLER_METRICS:
+        raise ValueError(by)
+    if start or end:
+        # Bounded by (days in range x products sold on those days), not by order count.
+        where, params = _date_range_clause('s.day', start, end)
+        sql = f"""SELECT s.product_id, p.name, SUM(s.units) AS units, SUM(s.revenue) AS revenue
+                  FROM sales_daily_product s LEFT JOIN products p ON p.id = s.product_id
+                  WHERE {where} GROUP BY s.product_id ORDER BY {by} DESC LIMIT ?"""
+    else:
+        # All-time totals: an index walk over product_sales_totals.
+        params = []
+        sql = f"""SELECT s.product_id, p.name, s.units, s.revenue
+                  FROM product_sales_totals s LEFT JOIN products p ON p.id = s.product_id
+                  ORDER BY s.{by} DESC LIMIT ?"""
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    return [{'product_id': product_id, 'name': name, 'units': units, 'revenue': round(revenue, 2)}
+            for product_id, name, units, revenue in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--db', default='store.db')
+    parser.add_argument('--chunk-size', type=int, default=REBUILD_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None) # transactions are explicit
+    conn.execute('PRAGMA busy_timeout = 5000')
+    def report(orders, order_items):
+        print(f"  folded {orders} orders, {order_items} order items")
+    result = rebuild_rollups(conn, args.chunk_size, progress=report)
+    conn.close()
+    print(f"Rebuilt sales rollups from {result['orders']} orders and {result['order_items']} order items.")
+
+if __name__ == '__main__':
+    main()
@@ -9,3 +9,18 @@ function escapeHtml(unsafe) {
          .replace(/"/g, "&quot;")
          .replace(/'/g, "&#039;");
 }
+
+// Data the server embedded in the page as <script type="application/json" id="...">;
+// null if the element is missing or the server could not load it.
+function readBootstrap(id) {
+    const element = document.getElementById(id);
+    if (!element) {
+        return null;
+    }
+    try {
+        return JSON.parse(element.textContent);
+    } catch (e) {
+        console.error(`Invalid bootstrap data in #${id}:`, e);
+        return null;
+    }
+}
@@ -0,0 +1,152 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from db_pool import DatabaseBusy, run_immediate_transaction
+
+class WriteQueueTimeout(DatabaseBusy):
+    """Raised when the writer thread did not start an operation within the queue timeout."""
+    reason = 'write_queue_timeout'
+
+class WriteQueue:
+    """Serialises database writes through one writer thread and commits them in groups.
+
+    Callers submit work(conn) functions and get a Future for their own result. The
+    writer drains up to max_batch queued operations (waiting at most max_wait seconds
+    for the batch to fill), runs each inside its own SAVEPOINT, and commits the whole
+    group with a single COMMIT, so N concurrent writers pay for one lock acquisition
+    and one WAL sync instead of N. An operation that raises is rolled back to its
+    savepoint without affecting the rest of the group; its future gets the exception.
+    Futures only resolve after the group's COMMIT, so a result means it is durable.
+
+    run() waits at most timeout seconds for the writer to pick an operation up (it may
+    be stuck behind a long group, or its thread may have died); the operation is then
+    cancelled, so it is never written, and WriteQueueTimeout is raised. Once picked up,
+    it runs to its outcome, which SQLite's busy timeout bounds: giving up then could
+    report a failure for a write that still commits.
+    """
+
+    def __init__(self, connect, max_batch=64, max_wait=0.002, timeout=5.0):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._operations = 0
+        self._failed_operations = 0
+        self._max_batch_seen = 0
+        self._timeouts = 0
+
+    def submit(self, work):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((work, future))
+        return future
+
+    def run(self, work):
+        future = self.submit(work)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                return future.result() # Already running: wait for its outcome
+            with self._stats_lock:
+                self._timeouts += 1
+            raise WriteQueueTimeout(f'The writer did not start the write within {self.timeout}s')
+
+    def _ensure_started(self):
+        # Started lazily so a pre-forking server starts one writer per worker process.
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._writer, name='write-queue', daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer(self):
+        conn = None
+        while True:
+            batch = [(work, future) for work, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    # Fail this group rather than the thread, and try again with the next one.
+                    print(f"Write queue could not open a database connection: {e}")
+                    for _, future in batch:
+                        future.set_exception(e)
+                    continue
+
+            def apply_batch(conn):
+                outcomes = []
+                for work, future in batch:
+                    conn.execute('SAVEPOINT write_op')
+                    try:
+                        outcomes.append((future, True, work(conn)))
+                        conn.execute('RELEASE SAVEPOINT write_op')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO SAVEPOINT write_op')
+                        conn.execute('RELEASE SAVEPOINT write_op')
+                        outcomes.append((future, False, e))
+                return outcomes
+
+            try:
+                outcomes = run_immediate_transaction(conn, apply_batch)
+            except Exception as e:
+                # The group could not be committed; nothing in it was written.
+                if isinstance(e, sqlite3.Error) and conn.in_transaction:
+                    conn.rollback()
+                for _, future in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._batches += 1
+                    self._operations += len(batch)
+                    self._failed_operations += len(batch)
+                continue
+
+            failed = 0
+            for future, ok, value in outcomes:
+                if ok:
+                    future.set_result(value)
+                else:
+                    failed += 1
+                    future.set_exception(value)
+            with self._stats_lock:
+                self._batches += 1
+                self._operations += len(batch)
+                self._failed_operations += failed
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_seconds': self.max_wait,
+                'timeout_seconds': self.timeout,
+                'queued': self._queue.qsize(),
+                'batches_total': self._batches,
+                'operations_total': self._operations,
+                'failed_operations_total': self._failed_operations,
+                'timeouts_total': self._timeouts,
+                'largest_batch': self._max_batch_seen,
+                'avg_batch_size': round(self._operations / self._batches, 2) if self._batches else 0,
+            }